@@ -0,0 +1,79 @@
+#
+# Registry of fixes for buggy runner data in specific games.
+#
+# The fixes live in a json file (by default corrections.json next to this file), as a list of
+#   {"gamePk": 447927, "inning": 9, "half": "bottom", "runner": 514888,
+#    "match": {"end": "2B"},        <- only apply if the runner entry looks like this
+#    "set": {"end": "3B"}}          <- then override these movement fields
+# or with "skip": true instead of "set", to drop the runner entry altogether.
+# "match" and "set" can use the movement fields start/end/isOut; "match" can also use
+# "event" (the event of the runner entry). inning, half and runner can all three be left out
+# of an entry to make it apply to every runner in the game (leaving out only some of them is
+# an error).
+#
+# Fixes are indexed by (gamePk, inning, half, runner id), so checking a runner entry is a
+# single dict lookup, which misses for almost every runner.
+#
+
+import os, json, hashlib
+
+CORRECTIONS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corrections.json")
+
+_movement_fields = ("start", "end", "isOut")
+
+class Corrections:
+    def __init__(self, fname=CORRECTIONS_FILE):
+        self.fname = fname
+        self._index = {}
+        # gamePks with fixes that apply to every runner
+        self._whole_game = set()
+        self._md5 = hashlib.md5()
+        if fname is not None:
+            with open(fname) as fid:
+                for entry in json.load(fid):
+                    self.add(entry)
+
+    def add(self, entry):
+        for k in entry.get("match", {}).keys() + entry.get("set", {}).keys():
+            if k not in _movement_fields and not (k == "event" and k in entry.get("match", {})):
+                raise Exception("Unknown field '{0}' in correction for gamePk {1}".format(k, entry["gamePk"]))
+        if "set" not in entry and not entry.get("skip", False):
+            raise Exception("Correction for gamePk {0} has neither 'set' nor 'skip'".format(entry["gamePk"]))
+        key = (entry["gamePk"], entry.get("inning"), entry.get("half"), entry.get("runner"))
+        if None in key[1:] and key[1:] != (None, None, None):
+            raise Exception("Correction for gamePk {0} must give all or none of inning, half and runner".format(entry["gamePk"]))
+        if key[1:] == (None, None, None):
+            self._whole_game.add(entry["gamePk"])
+        self._index[key] = self._index.get(key, ()) + (entry,)
+        self._md5.update(json.dumps(entry, sort_keys=True))
+
+    def digest(self):
+        # hash of all the fixes (changes whenever a fix is added or changed)
+        return self._md5.hexdigest()
+
+    def __len__(self):
+        return sum(len(v) for v in self._index.values())
+
+    def apply(self, gamePk, inning, half, runner):
+        # apply the fixes matching a runner entry (modifying it in place).
+        # Returns True if the entry should be skipped
+        fixes = self._index.get((gamePk, inning, half, runner["details"]["runner"]["id"]), ())
+        if gamePk in self._whole_game:
+            fixes += self._index[(gamePk, None, None, None)]
+        if not fixes:
+            return False
+
+        movement = runner["movement"]
+        for fix in fixes:
+            matched = True
+            for k, v in fix.get("match", {}).items():
+                cur = runner["details"]["event"] if k == "event" else movement[k]
+                if cur != v:
+                    matched = False
+                    break
+            if not matched:
+                continue
+            if fix.get("skip", False):
+                return True
+            movement.update(fix["set"])
+        return False
@@ -1,80 +1,369 @@
-import os,sys
+import os,sys,re
 import requests
-import json, gzip
+import json, gzip, hashlib
 import datetime as dt
+from multiprocessing.pool import ThreadPool
+from DownloadManifest import DownloadManifest
+from ScheduleCache import ScheduleCache
+from RequestScheduler import RequestScheduler
+from GameIO import game_extension, write_game_bytes, compress_zstd, store_dictionary, loads, load_game
 
-def get_gamePks(startdate, enddate, teamId=None):
+# root of the stats-api; can be pointed at a local stand-in (see FakeStatsAPI.py)
+BASE_URL = os.environ.get("PITCHDF_STATSAPI_URL", "http://statsapi.mlb.com")
+
+# where get_gamePks keeps its copy of the schedule between runs (None to not keep one)
+SCHEDULE_CACHE = os.path.join(os.path.expanduser("~"), ".pitchdf", "schedule_cache.json")
+
+def _fetch_schedule(startdate, enddate, session=None):
+    url = "{0}/api/v1/schedule?sportId=1&startDate={1}&endDate={2}".format(BASE_URL, startdate, enddate)
+    r = (session or requests).get(url=url)
+    if r.status_code != 200:
+        raise Exception(r.text)
+    return json.loads(r.text)["dates"]
+
+def _as_date(date):
+    # a date given as a dt.date, a dt.datetime or a "YYYY-MM-DD" string, as a dt.date
+    if isinstance(date, dt.datetime):
+        return date.date()
+    if isinstance(date, dt.date):
+        return date
+    if isinstance(date, basestring):
+        return dt.datetime.strptime(date, "%Y-%m-%d").date()
+    raise TypeError("Dates must be datetime.date, datetime.datetime or 'YYYY-MM-DD' strings, not {0}".format(type(date)))
+
+def get_schedule(startdate, enddate, teamId=None, cache_file=SCHEDULE_CACHE, jobs=4):
+    # get list of scheduled games between given dates, as dicts with keys
+    # "gamePk", "gameType", "status", "final", "away", "home" (team ids)
+    # dates that aren't already complete in the cache are requested one month per request,
+    # with up to jobs requests running at once
+    startdate, enddate = _as_date(startdate), _as_date(enddate)
+    cache = ScheduleCache(cache_file)
+
+    # group the dates we still need into per-month ranges
+    months = {}
+    date = startdate
+    while date <= enddate:
+        if not cache.is_complete(date):
+            rng = months.setdefault((date.year, date.month), [date, date])
+            rng[1] = date
+        date += dt.timedelta(1)
+
+    if len(months) > 0:
+        session = RequestScheduler(make_session(jobs), max_concurrency=jobs)
+        ranges = [months[k] for k in sorted(months)]
+        fetch = lambda rng: _fetch_schedule(rng[0], rng[1], session)
+        if jobs <= 1 or len(ranges) == 1:
+            results = [fetch(rng) for rng in ranges]
+        else:
+            pool = ThreadPool(min(jobs, len(ranges)))
+            try:
+                results = pool.map(fetch, ranges)
+            finally:
+                pool.close()
+                pool.join()
+        for rng,sched_dates in zip(ranges, results):
+            cache.update(rng[0], rng[1], sched_dates)
+        cache.save()
+
+    games = []
+    date = startdate
+    while date <= enddate:
+        for game in cache.games(date):
+            if teamId and teamId not in (game["away"], game["home"]):
+                continue
+            games.append(game)
+        date += dt.timedelta(1)
+    return games
+
+def get_gamePks(startdate, enddate, teamId=None, cache_file=SCHEDULE_CACHE, jobs=4):
     # get list of gamePks between given dates
     # if teamId is not None, then only games involving a given team
     # a list of numerical teamIds can be found here (or at list at bottom of this file):
     # http://statsapi.mlb.com/api/v1/teams?sportId=1
-    
-    url = "http://statsapi.mlb.com/api/v1/schedule?sportId=1&startDate={0}&endDate={1}".format(startdate, enddate)
-    if teamId:
-        url += "&teamId={0}".format(teamId)
+    # the schedule is cached by date in cache_file (see get_schedule)
+    # dates can be datetime.date's, datetime.datetime's or "YYYY-MM-DD" strings
+    startdate, enddate = _as_date(startdate), _as_date(enddate)
 
-    r = requests.get(url=url)
-    if r.status_code != 200:
-        raise Exception(r.text)
-    d = json.loads(r.text)
     pks = []
-    for date in d["dates"]:
-        for game in date["games"]:
-            typ = game["gameType"]
-            if typ not in ["R","P","D","L","W","F"]:
-                continue
-            pks.append(game["gamePk"])
+    for game in get_schedule(startdate, enddate, teamId, cache_file, jobs):
+        typ = game["gameType"]
+        if typ not in ["R","P","D","L","W","F"]:
+            continue
+        pks.append(game["gamePk"])
 
     return pks
 
-def download_single_game(gamePk, output_dir=None, use_gzip=True):
+def make_session(pool_size=1):
+    # a requests.Session that keeps its connections alive between requests,
+    # with enough pooled connections to be shared by pool_size threads
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max(1,pool_size))
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+# the header of the live feed (gamePk, gameData.game, gameData.status) comes before
+# any of the big blocks (players, plays, boxscore), so it can be read off the front of the
+# response without decoding the rest of it
+_re_gamePk = re.compile(r'"gamePk"\s*:\s*(\d+)')
+_re_gameData = re.compile(r'"gameData"\s*:\s*\{')
+_re_game = re.compile(r'"game"\s*:\s*\{([^{}]*)\}')
+_re_status = re.compile(r'"status"\s*:\s*\{([^{}]*)\}')
+_re_str_field = r'"{0}"\s*:\s*"((?:[^"\\]|\\.)*)"'
+_re_pk = re.compile(r'"pk"\s*:\s*(\d+)')
+RAW_CHUNK_SIZE = 64*1024
+RAW_MAX_PREFIX = 4*1024*1024
+
+def _str_field(block, key):
+    m = re.search(_re_str_field.format(key), block)
+    return m.group(1).replace("\\/","/") if m else None
+
+def scan_game_header(prefix):
+    # find the gamePk, game id, game type and status code in the first bytes of a game feed
+    # returns a dict with keys "gamePk", "id", "type", "statusCode", or None if the
+    # header isn't complete within prefix. The gamePk is taken from gameData.game.pk if the
+    # top-level one doesn't come first (it's None if neither is there)
+    m = _re_gameData.search(prefix)
+    if m is None:
+        return None
+    gd = prefix[m.end():]
+    mg = _re_game.search(gd)
+    ms = _re_status.search(gd)
+    if mg is None or ms is None:
+        return None
+    info = {
+        "id" : _str_field(mg.group(1), "id"),
+        "type" : _str_field(mg.group(1), "type"),
+        "statusCode" : _str_field(ms.group(1), "statusCode"),
+        }
+    if None in info.values():
+        return None
+    mpk = _re_gamePk.search(prefix, 0, m.start()) or _re_pk.search(mg.group(1))
+    info["gamePk"] = int(mpk.group(1)) if mpk else None
+    return info
+
+def _download_single_game_raw(gamePk, url, output_dir, use_gzip, session, manifest, return_dict, archive, zdict):
+    # streaming version of download_single_game: the response bytes go straight into
+    # the output file (or archive), and the full dict is only decoded if return_dict is True
+    r = (session or requests).get(url=url, stream=True)
+
+    if r.status_code != 200:
+        raise Exception(r.text)
+
+    chunks = r.iter_content(chunk_size=RAW_CHUNK_SIZE)
+    prefix = b""
+    info = None
+    for chunk in chunks:
+        prefix += chunk
+        info = scan_game_header(prefix)
+        if info is not None or len(prefix) > RAW_MAX_PREFIX:
+            break
+    if info is None:
+        r.close()
+        raise Exception("Couldn't find game header at start of feed for gamePk {0}".format(gamePk))
+
+    gid = "gid_"+info["id"].replace("/","_").replace("-","_")
+
+    status = info["statusCode"]
+    if status != "F":
+        print "game not completed! skipping."
+        r.close()
+        if manifest is not None:
+            manifest.record(gamePk, "incomplete", status=status)
+        return None
+
+    if info["type"] not in ["R","P","D","L","W","F"]:
+        print "game type not recognized! (probably spring training or all-star game). Skipping"
+        r.close()
+        if manifest is not None:
+            manifest.record(gamePk, "ignored", status=status)
+        return None
+
+    md5 = hashlib.md5()
+    # for an archive or a zstd dictionary the game is compressed in one go at the end,
+    # otherwise it's streamed through gzip
+    whole = archive is not None or zdict is not None
+    kept = [] if (return_dict or whole) else None
+    f = None
+    if archive is None:
+        os.system("mkdir -p " + output_dir)
+        outfile = "{0}/{1}.{2}".format(output_dir,gid, game_extension(use_gzip, zdict))
+        # write to a temporary name first, so an interrupted download never leaves a truncated game file
+        tmpfile = outfile + ".part"
+        if not whole:
+            f = gzip.open(tmpfile, 'wb') if use_gzip else open(tmpfile, 'wb')
+    try:
+        chunk = prefix
+        while chunk is not None:
+            if f is not None:
+                f.write(chunk)
+            md5.update(chunk)
+            if kept is not None:
+                kept.append(chunk)
+            chunk = next(chunks, None)
+        if f is not None:
+            f.close()
+        if archive is None and whole:
+            # (the dictionary goes next to the games, so that they can be read back without it)
+            store_dictionary(zdict, output_dir)
+            with open(tmpfile, 'wb') as f:
+                f.write(compress_zstd(b"".join(kept), zdict))
+    except:
+        # a failed (or interrupted) download leaves nothing behind
+        if f is not None:
+            f.close()
+        if archive is None and os.path.exists(tmpfile):
+            os.remove(tmpfile)
+        raise
+    if archive is not None:
+        entry = archive.add_raw(b"".join(kept), gamePk, info["id"])
+        outfile, size = archive.path, entry["length"]
+    else:
+        os.rename(tmpfile, outfile)
+        size = os.path.getsize(outfile)
+
+    if manifest is not None:
+        manifest.record(gamePk, "done", path=outfile, size=size, md5=md5.hexdigest(), status=status)
+
+    if return_dict:
+        return loads(b"".join(kept))
+    return outfile
+
+def download_single_game(gamePk, output_dir=None, use_gzip=True, session=None, manifest=None,
+                         raw=False, return_dict=False, archive=None, zdict=None):
     # download the feed of a single game
     # if output_dir is not None, will write the file to disk at output_dir/game_id
+    # (compressed with the zstd dictionary zdict, if given; see GameIO.py)
+    # if archive (a GameArchive open for appending) is not None, the game is added to it instead
+    # if session is not None, reuse its (keep-alive) connection instead of opening a new one
+    # (a RequestScheduler can also be used as the session)
+    # if manifest (a DownloadManifest) is not None, record the outcome in it
     # returns a dict of the game data
+    # if raw is True (requires output_dir or archive), the feed is streamed straight to disk without
+    # being decoded, and the output filename is returned instead (unless return_dict is True)
+
+    url = "{0}/api/v1.1/game/{1}/feed/live".format(BASE_URL, gamePk)
 
-    url = "http://statsapi.mlb.com/api/v1.1/game/{0}/feed/live".format(gamePk)
+    if raw:
+        if not output_dir and archive is None:
+            raise Exception("raw download mode requires an output_dir or archive")
+        return _download_single_game_raw(gamePk, url, output_dir, use_gzip, session, manifest, return_dict, archive, zdict)
 
-    r = requests.get(url=url)
+    r = (session or requests).get(url=url)
 
     if r.status_code != 200:
         raise Exception(r.text)
 
-    d = json.loads(r.text)
+    d = loads(r.content)
 
     gid = "gid_"+d["gameData"]["game"]["id"].replace("/","_").replace("-","_")
 
-    if d["gameData"]["status"]["statusCode"] != "F":
+    status = d["gameData"]["status"]["statusCode"]
+    if status != "F":
         print "game not completed! skipping."
+        if manifest is not None:
+            manifest.record(gamePk, "incomplete", status=status)
         return None
 
     typ = d["gameData"]["game"]["type"]
     if typ not in ["R","P","D","L","W","F"]:
         print "game type not recognized! (probably spring training or all-star game). Skipping"
+        if manifest is not None:
+            manifest.record(gamePk, "ignored", status=status)
         return None
 
-    if output_dir:
+    if archive is not None:
+        payload = r.text.encode('utf-8')
+        entry = archive.add_raw(payload, gamePk, d["gameData"]["game"]["id"])
+        if manifest is not None:
+            manifest.record(gamePk, "done", path=archive.path, size=entry["length"],
+                            md5=hashlib.md5(payload).hexdigest(), status=status)
+    elif output_dir:
         os.system("mkdir -p " + output_dir)
-        outfile = "{0}/{1}.{2}".format(output_dir,gid, "json.gz" if use_gzip else "json")
-        if use_gzip:
-            with gzip.open(outfile, 'wb') as f:
-                f.write(r.text.encode('utf-8'))
-        else:
-            with open(outfile, 'w') as f:
-                f.write(r.text.encode('utf-8'))
+        outfile = "{0}/{1}.{2}".format(output_dir,gid, game_extension(use_gzip, zdict))
+        payload = r.text.encode('utf-8')
+        if zdict is not None:
+            store_dictionary(zdict, output_dir)
+        write_game_bytes(outfile, payload, zdict)
+        if manifest is not None:
+            # size is the number of bytes on disk, md5 is of the (uncompressed) json
+            manifest.record(gamePk, "done", path=outfile, size=os.path.getsize(outfile),
+                            md5=hashlib.md5(payload).hexdigest(), status=status)
 
     return d 
 
 
-def download_gamePks(gamePks, output_dir=None, use_gzip=True):
-    ds = []
-    for gamePk in gamePks:
-        ds.append(download_single_game(gamePk, output_dir, use_gzip))
+def download_gamePks(gamePks, output_dir=None, use_gzip=True, jobs=1, skip_done=True, raw=False, scheduler=None,
+                     archive=None, zdict=None):
+    # download a list of games, using up to jobs concurrent requests over a shared session
+    # requests go through scheduler (by default a RequestScheduler allowing up to jobs requests at once),
+    # which rate-limits them and retries failures. A game that still fails is reported and
+    # skipped, without stopping the rest of the downloads
+    # if output_dir is given, downloads are recorded in its DownloadManifest, and
+    # (if skip_done) games that the manifest lists as done are not downloaded again
+    # if archive (a GameArchive open for appending) is given, games are added to it, and
+    # (if skip_done) games already in it are not downloaded again
+    # returns the game dicts in the same order as gamePks (None for failed or unwanted games),
+    # or in raw mode the output filenames (see download_single_game). Games that are skipped
+    # because they're already downloaded are read back from disk (or their filename is returned)
+    if scheduler is None:
+        scheduler = RequestScheduler(make_session(jobs), max_concurrency=jobs)
+    manifest = None
+    if output_dir:
+        os.system("mkdir -p " + output_dir)
+        manifest = DownloadManifest(output_dir)
+
+    def stored(gamePk):
+        # the copy of an already downloaded game, as download_single_game would have returned it,
+        # or None if there isn't one
+        if archive is not None:
+            if gamePk not in archive:
+                return None
+            return archive.path if raw else archive.read(gamePk)
+        if manifest is None or not manifest.is_done(gamePk):
+            return None
+        path = manifest.get(gamePk)["path"]
+        if not os.path.exists(path):
+            # deleted since; download it again
+            return None
+        if raw:
+            return path
+        try:
+            return load_game(path)
+        except Exception as e:
+            print "WARNING: couldn't read stored gamePk {0} ({1}), downloading it again".format(gamePk, str(e)[:200])
+            return None
+
+    def download(gamePk):
+        if skip_done:
+            d = stored(gamePk)
+            if d is not None:
+                return d
+        try:
+            return download_single_game(gamePk, output_dir, use_gzip, scheduler, manifest, raw=raw, archive=archive, zdict=zdict)
+        except Exception as e:
+            print "ERROR downloading gamePk {0}: {1}".format(gamePk, str(e)[:200])
+            if manifest is not None:
+                manifest.record(gamePk, "failed", error=str(e))
+            return None
+
+    if jobs <= 1:
+        return [download(gamePk) for gamePk in gamePks]
+
+    pool = ThreadPool(jobs)
+    try:
+        # map blocks until every game is done, and keeps the input ordering
+        ds = pool.map(download, gamePks)
+    finally:
+        pool.close()
+        pool.join()
     return ds
 
 
-def download_dates(startdate, enddate, teamId=None, output_dir=None, use_gzip=True):
+def download_dates(startdate, enddate, teamId=None, output_dir=None, use_gzip=True, jobs=1, skip_done=True, raw=False, scheduler=None,
+                   archive=None, zdict=None):
     pks = get_gamePks(startdate, enddate, teamId)
-    return download_gamePks(pks, output_dir, use_gzip)
+    return download_gamePks(pks, output_dir, use_gzip, jobs, skip_done, raw, scheduler, archive, zdict)
 
 
 ##############
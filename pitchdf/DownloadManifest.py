@@ -0,0 +1,79 @@
+#
+# Record of the games that have been downloaded into an output directory.
+# Stored as a json-lines journal in output_dir/manifest.jsonl (one line appended per game),
+# so an interrupted backfill loses nothing and a re-run can skip the games it already has.
+#
+
+import os
+import json
+import threading
+import datetime as dt
+
+class DownloadManifest:
+    fname = "manifest.jsonl"
+
+    def __init__(self, output_dir):
+        self.path = os.path.join(output_dir, self.fname)
+        self._lock = threading.Lock()
+        # latest entry for each gamePk
+        self._entries = {}
+        # if the last line was cut off, start the next entry on a fresh line
+        self._needs_newline = False
+        if os.path.exists(self.path):
+            with open(self.path) as fid:
+                for line in fid:
+                    self._needs_newline = not line.endswith("\n")
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # partially written line from a run that was killed
+                        continue
+                    self._entries[entry["gamePk"]] = entry
+
+    def __contains__(self, gamePk):
+        return gamePk in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, gamePk):
+        return self._entries.get(gamePk)
+
+    def is_done(self, gamePk):
+        # True if the game was completely downloaded (only looks at the in-memory index, no file access)
+        entry = self._entries.get(gamePk)
+        return entry is not None and entry["result"] == "done"
+
+    def missing(self, gamePks):
+        # gamePks from the given list that have not been completely downloaded yet
+        return [pk for pk in gamePks if not self.is_done(pk)]
+
+    def failed(self):
+        # gamePks whose last download attempt raised an error
+        return sorted(pk for pk,entry in self._entries.items() if entry["result"] == "failed")
+
+    def record(self, gamePk, result, path=None, size=None, md5=None, status=None, error=None):
+        # result is one of "done", "incomplete" (game not final yet), "ignored" (unwanted game type), "failed"
+        entry = {
+            "gamePk" : gamePk,
+            "result" : result,
+            "path" : path,
+            "size" : size,
+            "md5" : md5,
+            "status" : status,
+            "time" : dt.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
+            }
+        if error is not None:
+            entry["error"] = error
+        line = json.dumps(entry, sort_keys=True) + "\n"
+        with self._lock:
+            with open(self.path, 'a') as fid:
+                if self._needs_newline:
+                    fid.write("\n")
+                    self._needs_newline = False
+                fid.write(line)
+            self._entries[gamePk] = entry
+        return entry
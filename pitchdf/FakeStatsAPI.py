@@ -0,0 +1,264 @@
+#
+# Local stand-in for the parts of statsapi.mlb.com used by DownloadGames
+# (/api/v1/schedule and /api/v1.1/game/{pk}/feed/live), for testing and benchmarking
+# downloads without touching the real server.
+#
+# Games are either recorded feeds loaded from a directory, or synthetic ones: either a
+# realistic header with filler of a given size (for download benchmarks), or full simulated
+# games from SyntheticGames (synthetic_size=None), which GameJSONParser can parse.
+# The server can add latency to each response, fail a fraction of requests with a 5xx,
+# and enforce a request rate limit (answering 429 when exceeded), e.g.
+#
+#   api = FakeStatsAPI(games_dir="./gamedata", latency=0.05, error_rate=0.01, rate_limit=20)
+#   api.start()
+#   DownloadGames.BASE_URL = api.url
+#   ...
+#   api.stop()
+#
+
+import os, sys, re, glob, gzip, json, time, random, threading
+import datetime as dt
+import urlparse
+import BaseHTTPServer, SocketServer
+from SyntheticGames import SyntheticGames
+
+class _ThreadingHTTPServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.api._handle(self)
+
+
+class FakeStatsAPI:
+    _re_feed = re.compile(r"^/api/v1\.1/game/(\d+)/feed/live/?$")
+
+    def __init__(self, games_dir=None, synthetic_games=0, synthetic_size=2*1024*1024,
+                 host="127.0.0.1", port=0, latency=0.0, latency_jitter=0.0,
+                 error_rate=0.0, rate_limit=None, seed=0):
+        # games_dir: directory of recorded feeds (*.json.gz, *.json, gid_*/livefeed.json.gz)
+        # synthetic_games, synthetic_size: number and approximate size (bytes) of generated games to add.
+        #   With synthetic_size=None the games are simulated with SyntheticGames instead
+        # latency, latency_jitter: seconds added to every response (latency + uniform(0,jitter))
+        # error_rate: fraction of requests answered with a 500/503
+        # rate_limit: max requests per second (token bucket, burst of one second); None for no limit
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self._seed = seed
+        self._rand = random.Random(seed)
+        self._lock = threading.Lock()
+        self._tokens = float(rate_limit) if rate_limit else 0.0
+        self._last_refill = time.time()
+
+        # gamePk -> raw (uncompressed) feed bytes, and gamePk -> schedule entry
+        self._feeds = {}
+        self._schedule = {}
+
+        self.reset_stats()
+
+        if games_dir:
+            self.load_games(games_dir)
+        if synthetic_games > 0:
+            self.add_synthetic_games(synthetic_games, synthetic_size)
+
+        self._server = None
+        self._thread = None
+
+    def reset_stats(self):
+        self.stats = {"requests":0, "feeds":0, "schedules":0, "errors":0, "rate_limited":0, "bytes":0}
+
+    @property
+    def url(self):
+        return "http://{0}:{1}".format(self.host, self.port)
+
+    @property
+    def gamePks(self):
+        return sorted(self._feeds)
+
+    def add_game(self, raw, d=None):
+        # add a single feed (raw json bytes). d is the decoded dict, if already available
+        if d is None:
+            d = json.loads(raw)
+        g = d["gameData"]
+        pk = d["gamePk"]
+        self._feeds[pk] = raw
+        self._schedule[pk] = {
+            "gamePk" : pk,
+            "gameType" : g["game"]["type"],
+            "officialDate" : g["game"]["id"][:10].replace("/","-"),
+            "status" : {
+                "statusCode" : g["status"]["statusCode"],
+                "abstractGameState" : g["status"].get("abstractGameState", "Final"),
+                },
+            "teams" : {
+                "away" : {"team" : {"id" : g["teams"]["away"]["id"]}},
+                "home" : {"team" : {"id" : g["teams"]["home"]["id"]}},
+                },
+            }
+        return pk
+
+    def load_games(self, games_dir):
+        fnames = glob.glob(os.path.join(games_dir, "*.json.gz")) + \
+                 glob.glob(os.path.join(games_dir, "*.json")) + \
+                 glob.glob(os.path.join(games_dir, "gid_*", "livefeed.json.gz"))
+        for fname in sorted(fnames):
+            if fname.endswith(".gz"):
+                with gzip.open(fname, 'rb') as fid:
+                    raw = fid.read()
+            else:
+                with open(fname, 'rb') as fid:
+                    raw = fid.read()
+            self.add_game(raw)
+
+    def add_synthetic_games(self, ngames, size, startdate=dt.date(2019,3,28), games_per_day=15, first_pk=900000,
+                            **sim_options):
+        # games with a realistic header and a filler liveData block, to make up roughly size bytes each.
+        # If size is None, full simulated games instead (sim_options are passed on to SyntheticGames)
+        if size is None:
+            sim_options.setdefault("seed", self._seed)
+            gen = SyntheticGames(**sim_options)
+            for d in gen.games(ngames, startdate, games_per_day, first_pk):
+                self.add_game(json.dumps(d), d)
+            return
+        teams = [108,109,110,111,112,113,114,115,116,117,118,119,120,121,133,
+                 134,135,136,137,138,139,140,141,142,143,144,145,146,147,158]
+        filler = "x" * 1000
+        for i in range(ngames):
+            date = startdate + dt.timedelta(i // games_per_day)
+            away, home = teams[(2*i) % 30], teams[(2*i+1) % 30]
+            pk = first_pk + i
+            d = {
+                "gamePk" : pk,
+                "link" : "/api/v1.1/game/{0}/feed/live".format(pk),
+                "metaData" : {"wait" : 10},
+                "gameData" : {
+                    "game" : {"pk" : pk, "type" : "R", "doubleHeader" : "N",
+                              "id" : "{0}/t{1}mlb-t{2}mlb-1".format(date.strftime("%Y/%m/%d"), away, home)},
+                    "datetime" : {"dateTime" : date.strftime("%Y-%m-%dT23:05:00Z"),
+                                  "time" : "7:05", "ampm" : "PM"},
+                    "status" : {"abstractGameState" : "Final", "statusCode" : "F"},
+                    "teams" : {"away" : {"id" : away, "teamCode" : "t{0}".format(away)},
+                               "home" : {"id" : home, "teamCode" : "t{0}".format(home)}},
+                    },
+                "liveData" : {"filler" : [filler] * max(1, size // (len(filler)+3))},
+                }
+            self.add_game(json.dumps(d), d)
+
+    def start(self):
+        self._server = _ThreadingHTTPServer((self.host, self.port), _Handler)
+        self._server.api = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+
+    def _take_token(self):
+        if not self.rate_limit:
+            return True
+        with self._lock:
+            now = time.time()
+            self._tokens = min(float(self.rate_limit), self._tokens + (now-self._last_refill)*self.rate_limit)
+            self._last_refill = now
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return True
+            return False
+
+    def _send(self, handler, code, body, headers={}):
+        handler.send_response(code)
+        handler.send_header("Content-Type", "application/json;charset=UTF-8")
+        handler.send_header("Content-Length", str(len(body)))
+        for k,v in headers.items():
+            handler.send_header(k, v)
+        handler.end_headers()
+        handler.wfile.write(body)
+        with self._lock:
+            self.stats["bytes"] += len(body)
+
+    def _error(self, handler, code, message, headers={}):
+        self._send(handler, code, json.dumps({"messageNumber" : code, "message" : message}), headers)
+
+    def _handle(self, handler):
+        with self._lock:
+            self.stats["requests"] += 1
+            fail = self._rand.random() < self.error_rate
+            code = self._rand.choice([500, 503])
+            delay = self.latency + self._rand.uniform(0, self.latency_jitter)
+
+        if not self._take_token():
+            with self._lock:
+                self.stats["rate_limited"] += 1
+            self._error(handler, 429, "Too many requests", {"Retry-After" : "1"})
+            return
+
+        if delay > 0:
+            time.sleep(delay)
+
+        if fail:
+            with self._lock:
+                self.stats["errors"] += 1
+            self._error(handler, code, "Injected error")
+            return
+
+        url = urlparse.urlparse(handler.path)
+        m = self._re_feed.match(url.path)
+        if m:
+            pk = int(m.group(1))
+            if pk not in self._feeds:
+                self._error(handler, 404, "Game {0} not found".format(pk))
+                return
+            with self._lock:
+                self.stats["feeds"] += 1
+            self._send(handler, 200, self._feeds[pk])
+        elif url.path.rstrip("/") == "/api/v1/schedule":
+            with self._lock:
+                self.stats["schedules"] += 1
+            self._send(handler, 200, json.dumps(self._get_schedule(urlparse.parse_qs(url.query))))
+        else:
+            self._error(handler, 404, "Unknown endpoint " + url.path)
+
+    def _get_schedule(self, query):
+        start = query.get("startDate", ["0000-00-00"])[0]
+        end = query.get("endDate", ["9999-99-99"])[0]
+        teamId = query.get("teamId", [None])[0]
+        dates = {}
+        for pk in sorted(self._schedule):
+            game = self._schedule[pk]
+            date = game["officialDate"]
+            if date < start or date > end:
+                continue
+            if teamId and int(teamId) not in (game["teams"]["away"]["team"]["id"], game["teams"]["home"]["team"]["id"]):
+                continue
+            dates.setdefault(date, []).append(game)
+        return {"dates" : [{"date" : d, "games" : dates[d]} for d in sorted(dates)]}
+
+
+if __name__=="__main__":
+    # serve a directory of recorded games (or 100 synthetic ones) until interrupted
+    games_dir = sys.argv[1] if len(sys.argv) > 1 else None
+    api = FakeStatsAPI(games_dir=games_dir, synthetic_games=0 if games_dir else 100, port=8080)
+    api.start()
+    print "Serving {0} games at {1}".format(len(api.gamePks), api.url)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        api.stop()
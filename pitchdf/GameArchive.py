@@ -0,0 +1,201 @@
+#
+# Packed archive of game feeds, e.g. one per season, to avoid having thousands of
+# small json.gz files (and the directory listings and file opens that go with them).
+#
+#   <path>      each game's feed, compressed on its own (a gzip member), one after another
+#   <path>.idx  json-lines index: gamePk, id, date, byte offset and length of each game
+#   <path>.zdict  optional zstd dictionary (see GameIO.py). If present, games added to
+#                 the archive are compressed with it instead of gzip
+#
+# Any single game can be read with one seek. Adding a game appends to both files;
+# if a gamePk is added again, the newest copy is the one that's used.
+#
+#   archive = GameArchive("games_2019.pack", "a")
+#   archive.add_raw(raw_json_bytes)
+#   for gd in archive:
+#       parser.parse_game(gd)
+#
+
+import os, sys, glob, json, zlib, threading
+from DownloadGames import scan_game_header
+from GameIO import compress_gzip, decompress_gzip, compress_zstd, decompress_zstd, load_dictionary, read_game_bytes, loads
+
+class GameArchive:
+    def __init__(self, path, mode="r"):
+        # mode is "r" (read only) or "a" (read and append, creating the archive if needed)
+        if mode not in ["r","a"]:
+            raise Exception("GameArchive mode must be 'r' or 'a'")
+        self.path = path
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._index = {}
+        if mode == "r" and not os.path.exists(path):
+            raise Exception("Archive {0} does not exist".format(path))
+        self.zdict = load_dictionary(path + ".zdict") if os.path.exists(path + ".zdict") else None
+        cut_off = False
+        if os.path.exists(path + ".idx"):
+            with open(path + ".idx") as fid:
+                for line in fid:
+                    cut_off = not line.endswith("\n")
+                    if cut_off:
+                        # index line cut off by a crash; its data is ignored
+                        continue
+                    entry = json.loads(line)
+                    self._index[entry["gamePk"]] = entry
+        if mode == "a":
+            self._fdata = open(path, 'ab+')
+            self._fidx = open(path + ".idx", 'a')
+            if cut_off:
+                self._fidx.write("\n")
+        else:
+            self._fdata = open(path, 'rb')
+            self._fidx = None
+
+    def close(self):
+        self._fdata.close()
+        if self._fidx is not None:
+            self._fidx.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __contains__(self, gamePk):
+        return gamePk in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def entries(self):
+        # index entries, sorted by date then gamePk
+        return sorted(self._index.values(), key=lambda e:(e["date"], e["gamePk"]))
+
+    def gamePks(self, startdate=None, enddate=None):
+        # gamePks in the archive (optionally only between two dates), sorted by date then gamePk
+        pks = []
+        for e in self.entries():
+            if startdate is not None and e["date"] < startdate.strftime("%Y-%m-%d"):
+                continue
+            if enddate is not None and e["date"] > enddate.strftime("%Y-%m-%d"):
+                continue
+            pks.append(e["gamePk"])
+        return pks
+
+    def read_compressed(self, gamePk):
+        e = self._index[gamePk]
+        with self._lock:
+            self._fdata.seek(e["offset"])
+            return self._fdata.read(e["length"])
+
+    def read_raw(self, gamePk):
+        # uncompressed feed bytes of a single game
+        blob = self.read_compressed(gamePk)
+        if self._index[gamePk].get("codec", "gz") == "zst":
+            if self.zdict is None:
+                raise Exception("Archive {0} has zstd-compressed games but no dictionary".format(self.path))
+            return decompress_zstd(blob, self.zdict)
+        return decompress_gzip(blob)
+
+    def read(self, gamePk, paths=None):
+        # decoded dict of a single game (see GameIO.loads for paths)
+        return loads(self.read_raw(gamePk), paths)
+
+    def iter_raw(self, gamePks=None):
+        if gamePks is None:
+            gamePks = self.gamePks()
+        for pk in gamePks:
+            yield pk, self.read_raw(pk)
+
+    def iter_games(self, gamePks=None, paths=None):
+        for pk, raw in self.iter_raw(gamePks):
+            yield loads(raw, paths)
+
+    def __iter__(self):
+        return self.iter_games()
+
+    def add_compressed(self, blob, gamePk, gid, codec="gz"):
+        # append a game that is already compressed (a single gzip member, or with codec="zst"
+        # a zstd frame using this archive's dictionary)
+        if self.mode != "a":
+            raise Exception("Archive {0} is not open for appending".format(self.path))
+        with self._lock:
+            self._fdata.seek(0, os.SEEK_END)
+            offset = self._fdata.tell()
+            self._fdata.write(blob)
+            self._fdata.flush()
+            entry = {
+                "gamePk" : gamePk,
+                "id" : gid,
+                "date" : gid[:10].replace("/","-"),
+                "offset" : offset,
+                "length" : len(blob),
+                "codec" : codec,
+                }
+            # only index the game once its data is safely written
+            self._fidx.write(json.dumps(entry, sort_keys=True) + "\n")
+            self._fidx.flush()
+            self._index[gamePk] = entry
+        return entry
+
+    def add_raw(self, raw, gamePk=None, gid=None):
+        # append a game from its uncompressed feed bytes. gamePk and gid (the feed's
+        # gameData.game.id) are read off the feed if not given
+        if gamePk is None or gid is None:
+            info = scan_game_header(raw[:1024*1024])
+            if info is None:
+                raise Exception("Couldn't find game header in feed")
+            if gamePk is None:
+                gamePk = info["gamePk"]
+            if gid is None:
+                gid = info["id"]
+            if gamePk is None:
+                raise Exception("Couldn't find gamePk in feed")
+        if self.zdict is not None:
+            return self.add_compressed(compress_zstd(raw, self.zdict), gamePk, gid, "zst")
+        return self.add_compressed(compress_gzip(raw), gamePk, gid)
+
+
+def _peek_header(blob):
+    # decompress just enough of a gzipped feed to read its header
+    d = zlib.decompressobj(16+zlib.MAX_WBITS)
+    prefix = ""
+    pos = 0
+    while pos < len(blob):
+        prefix += d.decompress(blob[pos:pos+16384])
+        pos += 16384
+        info = scan_game_header(prefix)
+        if info is not None:
+            return info
+    return scan_game_header(prefix)
+
+def convert_directory(indir, archive_path):
+    # pack a directory tree of downloaded games (either indir/gid_*.json.gz, as written by
+    # DownloadGames, or indir/gid_*/livefeed.json.gz) into an archive.
+    # gzipped files are copied in without being recompressed, unless the archive has a zstd dictionary
+    fnames = sorted(glob.glob(os.path.join(indir, "gid_*.json*")) +
+                    glob.glob(os.path.join(indir, "gid_*", "livefeed.json*")))
+    fnames = [f for f in fnames if f.endswith((".json", ".json.gz", ".json.zst"))]
+    with GameArchive(archive_path, "a") as archive:
+        for fname in fnames:
+            if fname.endswith(".gz") and archive.zdict is None:
+                with open(fname, 'rb') as fid:
+                    blob = fid.read()
+                info = _peek_header(blob)
+                if info is None or info["gamePk"] is None:
+                    print "ERROR: couldn't read game header from {0}. Skipping.".format(fname)
+                    continue
+                archive.add_compressed(blob, info["gamePk"], info["id"])
+            else:
+                try:
+                    archive.add_raw(read_game_bytes(fname))
+                except Exception as e:
+                    print "ERROR: {0} in {1}. Skipping.".format(e, fname)
+        return len(archive)
+
+
+if __name__=="__main__":
+    # python GameArchive.py <input_dir> <archive>
+    n = convert_directory(sys.argv[1], sys.argv[2])
+    print "Archive {0} now holds {1} games".format(sys.argv[2], n)
@@ -0,0 +1,293 @@
+#
+# Reading and writing of stored game feeds.
+#
+# Feeds can be stored as plain json, gzipped json (.json.gz), or zstd-compressed json
+# using a shared dictionary trained on other feeds (.json.zst). Since every feed repeats the same
+# keys and the same player/team blocks, the dictionary makes the files much smaller than
+# gzip, and much faster to decompress. zstd needs the optional zstandard package.
+#
+# The dictionary for a .json.zst file is looked for as feeds.zdict in the file's directory,
+# then in its parent directory (or can be given explicitly).
+#
+# Feeds are decoded with ujson if it's installed, otherwise with the standard json module
+# (see set_decoder). Callers can also ask for only some subtrees of the feed, e.g.
+# paths=["gameData.game", "liveData.plays"]. The whole feed is still decoded, but the other
+# sections are dropped straight away rather than kept alive with the game.
+#
+# stream_game reads a stored feed incrementally instead (needs the optional ijson package),
+# yielding one element of a big array (e.g. liveData.plays.allPlays) at a time, so only a
+# single play is ever in memory rather than the whole feed.
+#
+
+import os, gzip, json, zlib, threading
+from contextlib import closing
+from decimal import Decimal
+from cStringIO import StringIO
+
+try:
+    import zstandard as zstd
+except ImportError:
+    zstd = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+# for streaming (see stream_game), preferably with the fast C backend
+try:
+    import ijson
+    from ijson.common import ObjectBuilder
+    try:
+        import ijson.backends.yajl2_c as ijson_backend
+    except ImportError:
+        ijson_backend = ijson
+except (ImportError, SyntaxError):
+    # (ijson 3 doesn't import on python 2: use ijson<3 there)
+    ijson = None
+
+DICT_NAME = "feeds.zdict"
+ZSTD_LEVEL = 10
+
+_dicts = {}
+# (directory, dictionary) pairs already checked by store_dictionary
+_stored_dicts = set()
+_stored_lock = threading.Lock()
+
+def _require_zstd():
+    if zstd is None:
+        raise Exception("The zstd codec requires the zstandard package (pip install zstandard)")
+
+def load_dictionary(dict_file):
+    # compression dictionary stored in dict_file (cached, so each file is only read once)
+    _require_zstd()
+    dict_file = os.path.abspath(dict_file)
+    if dict_file not in _dicts:
+        with open(dict_file, 'rb') as fid:
+            _dicts[dict_file] = zstd.ZstdCompressionDict(fid.read())
+    return _dicts[dict_file]
+
+def find_dictionary(fname):
+    # path of the dictionary belonging to a .json.zst file, or None
+    dname = os.path.dirname(os.path.abspath(fname))
+    for d in [dname, os.path.dirname(dname)]:
+        if os.path.exists(os.path.join(d, DICT_NAME)):
+            return os.path.join(d, DICT_NAME)
+    return None
+
+def store_dictionary(zdict, dname):
+    # make sure the dictionary zdict (object or path) is stored as dname/feeds.zdict, where
+    # find_dictionary looks for it when reading the .json.zst games written to dname.
+    # Raises if a different dictionary is already stored there
+    zd = _get_dict(zdict)
+    key = (os.path.abspath(dname), id(zd))
+    with _stored_lock:
+        if key in _stored_dicts:
+            return
+        fname = os.path.join(dname, DICT_NAME)
+        data = zd.as_bytes()
+        if os.path.exists(fname):
+            with open(fname, 'rb') as fid:
+                if fid.read() != data:
+                    raise Exception("{0} is a different compression dictionary; games compressed with another "
+                                    "one can't be stored in {1}".format(fname, dname))
+        else:
+            with open(fname + ".tmp", 'wb') as fid:
+                fid.write(data)
+            os.rename(fname + ".tmp", fname)
+        _stored_dicts.add(key)
+
+def train_dictionary(fnames, dict_file, dict_size=256*1024, max_samples=500):
+    # train a compression dictionary from up to max_samples stored games, and write it to dict_file
+    _require_zstd()
+    samples = [read_game_bytes(fname) for fname in fnames[:max_samples]]
+    zdict = zstd.train_dictionary(dict_size, samples)
+    with open(dict_file, 'wb') as fid:
+        fid.write(zdict.as_bytes())
+    _dicts.pop(os.path.abspath(dict_file), None)
+    return zdict
+
+def _get_dict(zdict):
+    # zdict can be a dictionary object or the path to one
+    if isinstance(zdict, basestring):
+        return load_dictionary(zdict)
+    return zdict
+
+def compress_gzip(raw):
+    # raw bytes -> a single gzip member
+    buf = StringIO()
+    with gzip.GzipFile(fileobj=buf, mode='wb') as f:
+        f.write(raw)
+    return buf.getvalue()
+
+def decompress_gzip(blob):
+    return zlib.decompress(blob, 16+zlib.MAX_WBITS)
+
+def compress_zstd(raw, zdict, level=ZSTD_LEVEL):
+    _require_zstd()
+    return zstd.ZstdCompressor(level=level, dict_data=_get_dict(zdict)).compress(raw)
+
+def decompress_zstd(blob, zdict):
+    _require_zstd()
+    return zstd.ZstdDecompressor(dict_data=_get_dict(zdict)).decompress(blob)
+
+def game_extension(use_gzip=True, zdict=None):
+    # file extension for a stored game
+    if zdict is not None:
+        return "json.zst"
+    return "json.gz" if use_gzip else "json"
+
+def write_game_bytes(fname, raw, zdict=None):
+    # write raw feed bytes, compressed according to the extension of fname
+    if fname.endswith(".zst"):
+        if zdict is None:
+            zdict = find_dictionary(fname)
+            if zdict is None:
+                raise Exception("No compression dictionary given or found for "+fname)
+        with open(fname, 'wb') as fid:
+            fid.write(compress_zstd(raw, zdict))
+    elif fname.endswith(".gz"):
+        with gzip.open(fname, 'wb') as fid:
+            fid.write(raw)
+    else:
+        with open(fname, 'wb') as fid:
+            fid.write(raw)
+
+def read_game_bytes(fname, zdict=None):
+    # raw (uncompressed) feed bytes of a stored game
+    if fname.endswith(".zst"):
+        if zdict is None:
+            zdict = find_dictionary(fname)
+            if zdict is None:
+                raise Exception("No compression dictionary given or found for "+fname)
+        with open(fname, 'rb') as fid:
+            return decompress_zstd(fid.read(), zdict)
+    if fname.endswith(".gz"):
+        with gzip.open(fname, 'rb') as fid:
+            return fid.read()
+    with open(fname, 'rb') as fid:
+        return fid.read()
+
+def _loads_ujson(raw, paths):
+    return _select(ujson.loads(raw), paths)
+
+def _loads_json(raw, paths):
+    return _select(json.loads(raw.decode("utf-8")), paths)
+
+def _insert(d, path, value):
+    keys = path.split(".")
+    for k in keys[:-1]:
+        d = d.setdefault(k, {})
+    d[keys[-1]] = value
+
+def _select(full, paths):
+    # the subtrees of full listed in paths (missing ones are left out), in the same nesting
+    if paths is None:
+        return full
+    d = {}
+    for path in paths:
+        node = full
+        try:
+            for k in path.split("."):
+                node = node[k]
+        except (KeyError, TypeError):
+            continue
+        _insert(d, path, node)
+    return d
+
+# available decoders, fastest first
+_decoders = [(name, f) for name, mod, f in [("ujson", ujson, _loads_ujson),
+                                            ("json", json, _loads_json)] if mod is not None]
+_decoder = _decoders[0]
+
+def available_decoders():
+    return [name for name, f in _decoders]
+
+def get_decoder():
+    return _decoder[0]
+
+def set_decoder(name):
+    # choose the json decoder by name (one of available_decoders())
+    global _decoder
+    for d in _decoders:
+        if d[0] == name:
+            _decoder = d
+            return
+    raise Exception("json decoder '{0}' is not available (installed: {1})".format(name, ", ".join(available_decoders())))
+
+def loads(raw, paths=None):
+    # decode raw feed bytes. paths: optional list of dotted paths (e.g. "liveData.plays") of the
+    # only subtrees to return, in a dict with the same nesting as the full feed (the rest is
+    # decoded too, and then dropped)
+    return _decoder[1](raw, paths)
+
+def load_game(fname, zdict=None, paths=None):
+    # decoded dict of a stored game (see loads for paths)
+    return loads(read_game_bytes(fname, zdict), paths)
+
+def open_game(fname, zdict=None):
+    # file object with the (uncompressed) feed bytes of a stored game, read as it goes
+    if fname.endswith(".zst"):
+        _require_zstd()
+        if zdict is None:
+            zdict = find_dictionary(fname)
+            if zdict is None:
+                raise Exception("No compression dictionary given or found for "+fname)
+        return zstd.ZstdDecompressor(dict_data=_get_dict(zdict)).stream_reader(open(fname, 'rb'))
+    if fname.endswith(".gz"):
+        return gzip.open(fname, 'rb')
+    return open(fname, 'rb')
+
+def _undecimal(obj):
+    # ijson gives non-integer numbers as Decimals; turn them into floats like json does
+    if isinstance(obj, dict):
+        return {k:_undecimal(v) for k,v in obj.iteritems()}
+    if isinstance(obj, list):
+        return [_undecimal(v) for v in obj]
+    if isinstance(obj, Decimal):
+        return float(obj)
+    return obj
+
+def _stream_header(fid, paths):
+    # one pass over the feed, building just the subtrees in paths
+    prefixes = dict((p, p.split(".")) for p in paths)
+    header = {}
+    builder, building = None, None
+    for prefix, event, value in ijson_backend.parse(fid):
+        if building is not None:
+            if prefix == building and event in ("end_map", "end_array"):
+                builder.event(event, value)
+                _insert(header, building, _undecimal(builder.value))
+                builder, building = None, None
+            else:
+                builder.event(event, value)
+        elif prefix in prefixes and event in ("start_map", "start_array"):
+            builder = ObjectBuilder()
+            builder.event(event, value)
+            building = prefix
+        elif prefix in prefixes and event not in ("map_key", "end_map", "end_array"):
+            _insert(header, prefix, _undecimal(value))
+    return header
+
+def stream_game(fname, header_paths, items_path, zdict=None):
+    # read a stored game incrementally. Returns (header, items):
+    #   header: dict with just the subtrees in header_paths (as with loads(raw, paths))
+    #   items: iterator over the elements of the array at items_path, decoded one at a time
+    # The feed is read twice (the header sections can come after the array in the feed), but
+    # never held in memory as a whole
+    if ijson is None:
+        raise Exception("Streaming game feeds requires the ijson package (pip install ijson, or \"ijson<3\" on python 2)")
+    with closing(open_game(fname, zdict)) as fid:
+        header = _stream_header(fid, header_paths)
+    def items():
+        with closing(open_game(fname, zdict)) as fid:
+            for item in ijson_backend.items(fid, items_path + ".item"):
+                yield _undecimal(item)
+    return header, items()
+
+def find_game_file(dname, basename="livefeed"):
+    # the stored feed in a gid_* directory, whichever way it's compressed (or None)
+    for ext in ["json.zst", "json.gz", "json"]:
+        fname = os.path.join(dname, "{0}.{1}".format(basename, ext))
+        if os.path.exists(fname):
+            return fname
+    return None
@@ -1,12 +1,40 @@
-import os,sys
+import os,sys,traceback,time
 import gzip, json, glob
+import collections
 import datetime as dt
 from Output import Output
 from OutputROOT import OutputROOT
 from OutputDF import OutputDF, OutputCSV
 from GameState import GameState
+from PitchInfo import extract_pitch
+from PitchBlock import PitchBlock
+from Corrections import Corrections
+from GameIO import stream_game
 from DownloadGames import *
 
+class RunnerConflict(Exception):
+    # runner movements of an event that can't all be applied to the current bases
+    def __init__(self, game_state, waiting):
+        gs = game_state
+        self.gid = gs.gid
+        self.gamePk = gs.gamePk
+        self.inning = gs.inning
+        self.half = gs.half
+        self.outs = gs.o
+        self.bases = {"first":gs.first, "second":gs.second, "third":gs.third}
+        # (runner id, start, end, isOut, event, base it's waiting on) for each stuck movement
+        self.pending = []
+        for b in ["first","second","third"]:
+            for runner in waiting[b]:
+                mv = runner["movement"]
+                self.pending.append((runner["details"]["runner"]["id"], mv["start"], mv["end"],
+                                     mv["isOut"], runner["details"]["event"], b))
+        msg = "Can't reconcile runners in gamePk {0}, {1} {2}, {3} out. Bases: 1B={4}, 2B={5}, 3B={6}".format(
+            self.gamePk, self.half, self.inning, self.outs, gs.first, gs.second, gs.third)
+        for p in self.pending:
+            msg += "\n    runner {0}: {1} -> {2} (isOut={3}, {4}), waiting on {5}".format(*p)
+        Exception.__init__(self, msg)
+
 class GameJSONParser:
     ignore_actions = ("Passed Ball", "Wild Pitch", "Caught Stealing 2B",
                       "Caught Stealing 3B", "Defensive Switch", 
@@ -17,16 +45,47 @@ class GameJSONParser:
                       "Pickoff 2B", "Caught Stealing Home","Error", "Pickoff Caught Stealing Home",
                       "Pickoff 3B", "Pickoff Caught Stealing 3B", "Pickoff Error 3B")
 
-    base_map = {'1B':'first', '2B':'second', '3B':'third'}
-    runner_dict = {}
+    # bump whenever a change to the parser changes its output, or the row format of
+    # OutputDF.take_rows changes (invalidates ParseCache entries)
+    parser_version = 2
 
-    def __init__(self, outputter):
+    base_map = {'1B':'first', '2B':'second', '3B':'third'}
+    # the parts of a game feed that parse_game reads, e.g. for GameIO.load_game(fname, paths=GameJSONParser.feed_paths)
+    # (allPlays last, see parse_game_stream)
+    feed_paths = ["gameData.game", "gameData.datetime", "gameData.teams", "gameData.players",
+                  "liveData.boxscore.officials", "liveData.linescore.innings", "liveData.plays.allPlays"]
+    # order to try runner movements in, by start base (lead runner first)
+    _lead_order = {'3B':0, '2B':1, '1B':2, None:3}
+
+    def __init__(self, outputter, corrections=None, quarantine=False, quarantine_log=None, stats=None, batch=True):
+        # corrections: Corrections registry of data fixes (default: the one in corrections.json)
+        # quarantine: if True, a game that fails to parse doesn't raise. Its rows are rolled back,
+        #   and the error and game context are kept in self.quarantined (and appended to the
+        #   json-lines file quarantine_log, if given)
+        # stats: ParseStats to record timing and counts in (off if None)
+        # batch: if the output supports it, collect the pitches of a game in a PitchBlock and hand
+        #   them over with a single add_entries call, rather than calling add_entry for each
         self.game_state = GameState()
         if not isinstance(outputter, Output):
             raise TypeError("Must provide an Output object to the parser!")
         self.output = outputter
+        if quarantine and not outputter.supports_rollback:
+            raise TypeError("Quarantine mode needs an output that can roll back rows (e.g. OutputDF)")
+        self.quarantine = quarantine
+        self.quarantine_log = quarantine_log
+        self.quarantined = []
+        self.stats = stats
+        self.block = PitchBlock() if batch and outputter.supports_batch else None
+        self.corrections = corrections if corrections is not None else Corrections()
+        self.player_names = {}
+        # index in allPlays of the next play to parse (see snapshot)
+        self.next_play = 0
         self.unique_events = []                
 
+    def version_key(self):
+        # identifies everything besides the feed itself that the parsed rows depend on
+        return "{0}-{1}-{2}".format(self.parser_version, self.corrections.digest(), type(self.output).__name__)
+
 
     def process_runner(self, runner):
         pid = runner["details"]["runner"]["id"]
@@ -58,75 +117,27 @@ class GameJSONParser:
 
         if isOut:
             self.game_state.o += 1
-    
-        self.runner_dict[runner["details"]["runner"]["fullName"].replace(".","").replace(" ","")] = pid
 
 
     def process_pitch(self, pitch):
-        class PitchInfo:
-            pass
-        pinfo = PitchInfo()
-
-        pinfo.pitchidx = pitch["pitchNumber"]
-        pinfo.des = pitch["details"]["description"]
-        pinfo.type = pitch["details"]["call"]["code"]
-        if "type" in pitch["details"]:
-            pinfo.pitch_type = pitch["details"]["type"]["code"]
-        elif "Automatic Ball" in pinfo.des:
-            pinfo.pitch_type = "IN"
-        else:
-            pinfo.pitch_type = "UN"
-
-        pinfo.x = pitch["pitchData"]["coordinates"].get("x",-9999)
-        pinfo.y = pitch["pitchData"]["coordinates"].get("y",-9999)
-        pinfo.px = pitch["pitchData"]["coordinates"].get("pX",-9999)
-        pinfo.pz = pitch["pitchData"]["coordinates"].get("pZ",-9999)
-        pinfo.pfx_x = pitch["pitchData"]["coordinates"].get("pfxX",-9999)
-        pinfo.pfx_z = pitch["pitchData"]["coordinates"].get("pfxZ",-9999)
-        pinfo.x0 = pitch["pitchData"]["coordinates"].get("x0",-9999)
-        pinfo.y0 = pitch["pitchData"]["coordinates"].get("y0",-9999)
-        pinfo.z0 = pitch["pitchData"]["coordinates"].get("z0",-9999)
-        pinfo.vx0 = pitch["pitchData"]["coordinates"].get("vX0",-9999)
-        pinfo.vy0 = pitch["pitchData"]["coordinates"].get("vY0",-9999)
-        pinfo.vz0 = pitch["pitchData"]["coordinates"].get("vZ0",-9999)
-        pinfo.ax = pitch["pitchData"]["coordinates"].get("aX",-9999)
-        pinfo.ay = pitch["pitchData"]["coordinates"].get("aY",-9999)
-        pinfo.az = pitch["pitchData"]["coordinates"].get("aZ",-9999)
-
-        pinfo.break_y = pitch["pitchData"]["breaks"].get("breakY",-9999)
-        pinfo.break_angle = pitch["pitchData"]["breaks"].get("breakAngle",-9999)
-        # for some reason the break angle is abs() valued in the JSON... correct based on sign of ax
-        if pinfo.ax > 0 and pinfo.break_angle > -9998:
-            pinfo.break_angle *= -1
-        pinfo.break_length = pitch["pitchData"]["breaks"].get("breakLength",-9999)
-        pinfo.spin_dir = pitch["pitchData"]["breaks"].get("spinDirection",-9999)
-        pinfo.spin_rate = pitch["pitchData"]["breaks"].get("spinRate",-9999)
-
-        pinfo.start_speed = pitch["pitchData"].get("startSpeed",-9999)
-        pinfo.end_speed = pitch["pitchData"].get("endSpeed",-9999)
-        pinfo.sz_top = pitch["pitchData"].get("strikeZoneTop",-9999)
-        pinfo.sz_bot = pitch["pitchData"].get("strikeZoneBottom",-9999)
-        pinfo.zone = pitch["pitchData"].get("zone",-1)
-        pinfo.nasty = int(pitch["pitchData"].get("nastyFactor",-1))
-        pinfo.type_confidence = pitch["pitchData"].get("typeConfidence",-9999)
-
-        if "hitData" in pitch:
-            pinfo.hit_x = pitch["hitData"]["coordinates"].get("coordX", -9999)
-            pinfo.hit_y = pitch["hitData"]["coordinates"].get("coordY", -9999)
-            pinfo.hit_launchAngle = pitch["hitData"].get("launchAngle", -9999)
-            pinfo.hit_launchSpeed = pitch["hitData"].get("launchSpeed", -9999)
-            pinfo.hit_totalDistance = pitch["hitData"].get("totalDistance", -9999)
-            pinfo.hit_location = int(pitch["hitData"].get("location", -1))
-            pinfo.hit_hardness = pitch["hitData"].get("hardness", "NONE")
-            pinfo.hit_trajectory = pitch["hitData"].get("trajectory", "NONE")
-
+        pinfo = extract_pitch(pitch)
 
         # print "Inning: {0}, Pitcher: {1}, Batter: {2}, Count: {3}-{4}, Outs: {5}, Pitch Type: {6}, Result: {7}".format(
         #     self.game_state.inning"], self.game_state['pitcher'], self.game_state['batter'], self.game_state['b'], 
         #     self.game_state['s'], self.game_state['o'], pinfo.pitch_type"], pinfo.type"])
 
 
-        self.output.add_entry(self.game_state, pinfo)
+        if self.block is not None:
+            self.block.add(self.game_state, pinfo)
+            if self.stats is not None:
+                self.stats.count("pitches")
+        elif self.stats is None:
+            self.output.add_entry(self.game_state, pinfo)
+        else:
+            t0 = time.time()
+            self.output.add_entry(self.game_state, pinfo)
+            self.stats.add_time("add_entry", time.time()-t0)
+            self.stats.count("pitches")
 
         self.game_state.pitch_counts[self.game_state.pitcher] += 1
         self.game_state.cur_pc = self.game_state.pitch_counts[self.game_state.pitcher]
@@ -158,7 +169,6 @@ class GameJSONParser:
             gs.third = -1
             gs.base_state = 0
             gs.o = 0
-            self.runner_dict = {}
 
         gs.away_score_afterInn = \
             self.inning_scores[(gs.half,gs.inning)][0]
@@ -218,6 +228,8 @@ class GameJSONParser:
                     pass
                 elif event["type"] == "action":
                     evttype = event["details"]["event"]
+                    if self.stats is not None:
+                        self.stats.count("actions")
                     if evttype == "Pitching Substitution":
                         gs.pitcher = event["player"]["id"]
                         if gs.pitcher not in gs.pitch_counts:
@@ -233,153 +245,30 @@ class GameJSONParser:
                             gs.PH = "R"
                     elif evttype == "Offensive Substitution":
                         if "pinch-runner" in event["details"]["description"].lower():
-                            r_name = event["details"]["description"].split("replaces ")[-1].replace(".","").replace(" ","") \
-                                        .replace("CCron","CJCron").replace("JHardy","JJHardy").replace("APollock","AJPollock") \
-                                        .replace("AEllis","AJEllis").replace("JMartinez","JDMartinez") \
-                                        .replace("NickCastellanosXXX","NicholasCastellanos").replace("NoriAoki","NorichikaAoki") \
-                                        .replace("JArencibia","JPArencibia").replace("CarlosSanchez","YolmerSanchez") \
-                                        .replace("RickieWeeks","RickieWeeksJr").replace("GiovannyUrshela","GioUrshela") \
-                                        .replace("IvanDeJesus","IvanDeJesusJr").replace("APierzynski","AJPierzynski") \
-                                        .replace("AReed","AJReed").replace("YulieskiGurriel","YuliGurriel") \
-                                        .replace("RonaldAcuna","RonaldAcunaJr").replace("JoseFernandez","JoseMiguelFernandez") \
-                                        .replace("AlbertAlmora","AlbertAlmoraJr").replace("VladimirGuerrero","VladimirGuerreroJr") \
-                                        .replace("LaMonteWade","LaMonteWadeJr") \
-                                        .replace("JrJr","Jr")
-                            if r_name not in self.runner_dict:
-                                print "runner_dict:", self.runner_dict
-                                raise Exception("Pinch-runner replacing {0}, who doesn't appear to be on the bases".format(r_name))
-                            pid = self.runner_dict[r_name]
+                            pid = self.replaced_runner(event)
                             for b in ["first","second","third"]:
                                 if getattr(gs, b) == pid:
                                     setattr(gs, b,  event["player"]["id"])
-                            pr_name = event["details"]["description"].split(" replaces")[0].split("-runner ")[-1].replace(".","").replace(" ","")
-                            self.runner_dict[pr_name] = event["player"]["id"]
 
                     elif evttype == "Runner Placed On Base" and "2nd" in event["details"]["description"]:
                         # stupid 2020 rule where runner starts on second in extras
                         gs.second = event["player"]["id"]
                         gs.base_state = 2
-                        name = event["details"]["description"].split(" starts inning")[0].replace(" ","").replace(".","")
-                        self.runner_dict[name] = gs.second
 
                     elif evttype in self.ignore_actions:
-                        pass
+                        if self.stats is not None:
+                            self.stats.count("skipped_actions")
                     else:
                         raise Exception("Unknown action: "+evttype)
                 elif event["type"] not in ["pickoff"]:
                     raise Exception("Unknown event type "+event["type"])
 
-            # holy shit the runner data is a mess
-            # out of order, duplicate entries, entries for a runner going from 3B to 3B, etc....
-            # a bunch of ad-hoc fixes here to make sure we get it right (only 75% sure that it's doing the right thing...)
-            runners = sorted(runners, key=lambda x:x["movement"]["isOut"], reverse=True)
-            to_do = list(range(len(runners)))
-            isout = []
-
-            while len(to_do)>0:
-                idx = to_do[0]
-                rid = runners[idx]["details"]["runner"]["id"]
-                if runners[idx]["movement"]["start"] == "4B":
-                    runners[idx]["movement"]["start"] = "3B"
-                if runners[idx]["movement"]["isOut"]:
-                    runners[idx]["movement"]["end"] = None
-                if runners[idx]["details"]["isScoringEvent"] and runners[idx]["movement"]["end"] == "4B":
-                    runners[idx]["movement"]["end"] = "score"
-                # now very specific custom overrides for buggy data
-                if gs.gamePk==447927 and rid==514888 and gs.inning==9 and gs.half=="bottom" and runners[idx]["movement"]["end"] == "2B":
-                    runners[idx]["movement"]["end"] = "3B"
-                if gs.gamePk==448903 and rid==592450 and gs.inning==6 and gs.half=="top" and runners[idx]["movement"]["start"] == "2B":
-                    runners[idx]["movement"]["start"] = "1B"
-                if gs.gamePk==531490 and rid==607208 and gs.inning==1 and gs.half=="bottom" and runners[idx]["movement"]["start"] == "2B":
-                    runners[idx]["movement"]["start"] = "1B"
-                if gs.gamePk==531651 and rid==624577 and gs.inning==1 and gs.half=="bottom" and runners[idx]["movement"]["start"] == "3B":
-                    runners[idx]["movement"]["start"] = "1B"
-                if gs.gamePk==565928 and rid==502481 and gs.inning==7 and gs.half=="top" and runners[idx]["movement"]["start"] is None:
-                    runners[idx]["movement"]["end"] = None
-                    runners[idx]["movement"]["isOut"] = True
-                if gs.gamePk==565932 and rid==665742 and gs.inning==1 and gs.half=="bottom" and runners[idx]["movement"]["start"] == "1B":
-                    runners[idx]["movement"]["start"] = "2B"
-                if gs.gamePk==566213 and rid==516782 and gs.inning==1 and gs.half=="bottom" and runners[idx]["movement"]["start"] == "1B":
-                    runners[idx]["movement"]["start"] = "2B"
-                if gs.gamePk==566702 and rid==596059 and gs.inning==6 and gs.half=="top" and runners[idx]["movement"]["start"] == "1B":
-                    runners[idx]["movement"]["start"] = "3B"
-                if gs.gamePk==567416 and rid==623912 and gs.inning==4 and gs.half=="bottom" and runners[idx]["movement"]["start"] == "3B":
-                    runners[idx]["movement"]["start"] = "2B"
-                if gs.gamePk==566630 and rid==657557 and gs.inning==5 and gs.half=="bottom" and runners[idx]["movement"]["isOut"] == True:
-                    to_do = to_do[1:]
-                    continue
-                if gs.gamePk==566155 and rid==595777 and gs.inning==4 and gs.half=="bottom" and runners[idx]["movement"]["start"] == "2B":
-                    runners[idx]["movement"]["start"] = "1B"
-                if gs.gamePk==567432 and rid==656371 and gs.inning==4 and gs.half=="bottom" and runners[idx]["movement"]["start"] is None:
-                    runners[idx]["movement"]["end"] = "1B"
-                if gs.gamePk==565003 and rid==596105 and gs.inning==2 and gs.half=="bottom" and runners[idx]["movement"]["start"] == "1B":
-                    runners[idx]["movement"]["start"] = "2B"
-                if gs.gamePk==599336 and rid==665742 and gs.inning==8 and gs.half=="bottom" and runners[idx]["movement"]["start"] == "2B":
-                    runners[idx]["movement"]["start"] = "1B"
-                if gs.gamePk==631014 and runners[idx]["movement"]["end"] == "0B":
-                    to_do = to_do[1:]
-                    continue
-
-                start = runners[idx]["movement"]["start"]
-                end = runners[idx]["movement"]["end"]
-                if rid in isout or (end in ["1B","2B","3B"] and getattr(gs, self.base_map[end]) == rid):
-                    to_do = to_do[1:]
-                    continue
-                if start is None and end is None and runners[idx]["movement"]["isOut"]:
-                    for bshort, blong in self.base_map.items():
-                        if getattr(gs, blong) == rid:
-                            start = bshort
-                            runners[idx]["movement"]["start"] = bshort
-                            break
-                    
-
-                # I see no resort other than to just hard code it to skip some particularly buggy ones...
-                if (gs.gamePk,gs.inning, gs.half, rid, runners[idx]["details"]["event"]) in \
-                   [(380974,12,"bottom",407893,"Defensive Indiff"),
-                    (413681,2,"bottom",624577,"Runner Out"),
-                    (413681,2,"bottom",624577,"Forceout"),
-                    (415742,2,"top",461865,"Double Play"),
-                    (447076,7,"bottom",572863,"Runner Out"),
-                   ]:
-                    to_do = to_do[1:]
-                    continue
-
-                # if gs.gid == "2019/09/05/anamlb-oakmlb-1":# and gs.inning==7 and gs.half=="bottom":
-                #     print gs.half, gs.inning, gs.o, rid, start, end, gs.first, gs.second, gs.third
-                #     raw_input()
-
-                # buggy thing where a runner on 2B has an entry for 3B to score, with no entry for 2B to 3B
-                if len(to_do)==1 and end=='score' and start is not None and getattr(gs, self.base_map[start]) != rid:
-                    for b in ['first', 'second', 'third']:
-                        if getattr(gs, b) == rid:                                        
-                            setattr(gs, b, -1)
-                    setattr(gs, self.base_map[start], rid)
-
-                # make sure start is None (i.e. it's the batter), or the runner is already at start
-
-                clear_path = True
-                if (end=='1B' or start is None and end in ['2B','3B']) and gs.first != -1:
-                    clear_path = False
-                if (end=='2B' or start in [None, '1B'] and end=='3B') and gs.second != -1:
-                    clear_path = False
-                if end=='3B' and gs.third != -1:
-                    clear_path = False
-
-                # print gs.half, gs.inning, gs.o, rid, start, end, gs.first, gs.second, gs.third
-
-                if (start is None or \
-                    getattr(gs, self.base_map[start]) == rid) and \
-                   (end in [None, 'score'] or gs.o==3 or clear_path):
-                    self.process_runner(runners[idx])
-                    to_do = to_do[1:]
-                    if end is None or end is 'score':
-                        isout.append(rid)
-                else:
-                    if len(to_do)==1:
-                        print gs.half, gs.inning, gs.o, rid, start, end, gs.first, gs.second, gs.third
-                        raise Exception("Shouldn't get here, we've reached an infinite loop! See above for state")
-                    else:
-                        to_do = to_do[1:] + to_do[:1]
+            if self.stats is None:
+                self.reconcile_runners(runners)
+            elif runners:
+                t0 = time.time()
+                self.reconcile_runners(runners)
+                self.stats.add_time("runners", time.time()-t0)
 
         if gs.home_score_afterAB != gs.home_score:
             print gs
@@ -391,7 +280,203 @@ class GameJSONParser:
         gs.o = atbat["count"]["outs"]
 
 
-    def parse_game(self, gd):
+    @staticmethod
+    def _name_key(name):
+        return name.replace(".","").replace(" ","").lower()
+
+    def index_players(self, players):
+        # per-game index of player id -> the ways their name can be written in event descriptions
+        self.player_names = {}
+        for p in players.values():
+            names = set()
+            for name in [p.get("fullName"), p.get("nameFirstLast"), p.get("firstLastName"),
+                         u"{0} {1}".format(p.get("useName",""), p.get("lastName","")),
+                         u"{0} {1}".format(p.get("firstName",""), p.get("lastName","")),
+                         u"{0} {1} {2}".format(p.get("useName",""), p.get("lastName",""), p.get("nameSuffix",""))]:
+                if name:
+                    names.add(self._name_key(name))
+            self.player_names[p["id"]] = (names, self._name_key(p.get("lastName","")))
+
+    def replaced_runner(self, event):
+        # id of the runner a pinch-runner replaces. Newer feeds give it directly as the
+        # replacedPlayer; otherwise match the name in the description against the runners on base
+        gs = self.game_state
+        if "replacedPlayer" in event:
+            return event["replacedPlayer"]["id"]
+        name = self._name_key(event["details"]["description"].split("replaces ")[-1])
+        on_base = [pid for pid in [gs.first, gs.second, gs.third] if pid != -1]
+        matches = []
+        for pid in on_base:
+            names, last_name = self.player_names.get(pid, (set(), ""))
+            if name in names:
+                return pid
+            if last_name and last_name in name:
+                matches.append(pid)
+        # no exact match (new name quirk?): fall back to a unique last name match
+        if len(matches) == 1:
+            return matches[0]
+        raise Exception("Pinch-runner replacing {0}, who doesn't appear to be on the bases (runners: {1})".format(name, on_base))
+
+    def _blocking_base(self, start, end, rid):
+        # the base that keeps a runner from moving start->end right now (None if it can move)
+        gs = self.game_state
+        # make sure start is None (i.e. it's the batter), or the runner is already at start
+        if start is not None and getattr(gs, self.base_map[start]) != rid:
+            return self.base_map[start]
+        if end in [None, 'score'] or gs.o==3:
+            return None
+        # and that the bases on the way are clear
+        if (end=='1B' or start is None and end in ['2B','3B']) and gs.first != -1:
+            return "first"
+        if (end=='2B' or start in [None, '1B'] and end=='3B') and gs.second != -1:
+            return "second"
+        if end=='3B' and gs.third != -1:
+            return "third"
+        return None
+
+    def reconcile_runners(self, runners):
+        # holy shit the runner data is a mess
+        # out of order, duplicate entries, entries for a runner going from 3B to 3B, etc....
+        # a bunch of ad-hoc fixes here to make sure we get it right (only 75% sure that it's doing the right thing...)
+        #
+        # Movements are tried outs first, then lead runner first. A movement that can't be applied yet
+        # (runner not at its start base yet, or a base on the way still occupied) waits on that base,
+        # and is tried again once the base changes. So each movement is applied exactly once, and
+        # if nothing is left to try while movements are still waiting, it's a real conflict.
+        gs = self.game_state
+
+        entries = []
+        for runner in runners:
+            mv = runner["movement"]
+            if mv["start"] == "4B":
+                mv["start"] = "3B"
+            if mv["isOut"]:
+                mv["end"] = None
+            if runner["details"]["isScoringEvent"] and mv["end"] == "4B":
+                mv["end"] = "score"
+            # now very specific custom overrides for buggy data (see corrections.json)
+            if self.corrections.apply(gs.gamePk, gs.inning, gs.half, runner):
+                if self.stats is not None:
+                    self.stats.count("runner_skips")
+                continue
+            entries.append(runner)
+        entries.sort(key=lambda x:(not x["movement"]["isOut"], self._lead_order.get(x["movement"]["start"], 3)))
+
+        if self.stats is not None:
+            self.stats.count("runner_entries", len(runners))
+        ready = collections.deque(entries)
+        waiting = {"first":[], "second":[], "third":[]}
+        finished = set()    # runners who are out or have scored
+        remaining = len(entries)
+        last_try = False
+
+        while remaining > 0:
+            if not ready:
+                # nothing left that can move. If it's down to a single movement, give it one more
+                # try (the scoring fix below only applies to the very last one)
+                if remaining > 1 or last_try:
+                    raise RunnerConflict(gs, waiting)
+                last_try = True
+                for b in waiting:
+                    ready.extend(waiting[b])
+                    waiting[b] = []
+                continue
+
+            runner = ready.popleft()
+            mv = runner["movement"]
+            rid = runner["details"]["runner"]["id"]
+            start = mv["start"]
+            end = mv["end"]
+            if rid in finished or (end in ["1B","2B","3B"] and getattr(gs, self.base_map[end]) == rid):
+                # already out or scored, or already on the base it's moving to
+                remaining -= 1
+                if self.stats is not None:
+                    self.stats.count("runner_skips")
+                continue
+            if start is None and end is None and mv["isOut"]:
+                for bshort, blong in self.base_map.items():
+                    if getattr(gs, blong) == rid:
+                        start = bshort
+                        mv["start"] = bshort
+                        break
+
+            # buggy thing where a runner on 2B has an entry for 3B to score, with no entry for 2B to 3B
+            if remaining==1 and end=='score' and start is not None and getattr(gs, self.base_map[start]) != rid:
+                for b in ['first', 'second', 'third']:
+                    if getattr(gs, b) == rid:
+                        setattr(gs, b, -1)
+                setattr(gs, self.base_map[start], rid)
+
+            blocked = self._blocking_base(start, end, rid)
+            if blocked is not None:
+                waiting[blocked].append(runner)
+                if self.stats is not None:
+                    self.stats.count("runner_retries")
+                continue
+
+            before = (gs.first, gs.second, gs.third)
+            three_outs = gs.o==3
+            self.process_runner(runner)
+            remaining -= 1
+            if self.stats is not None:
+                self.stats.count("runner_moves")
+            if end is None or end == 'score':
+                finished.add(rid)
+            # wake up the movements waiting on a base that just changed
+            for b, prev in zip(["first","second","third"], before):
+                if getattr(gs, b) != prev or (gs.o==3 and not three_outs):
+                    ready.extend(waiting[b])
+                    waiting[b] = []
+
+    def parse_game(self, gd, start_play=None, state=None, complete_only=False):
+        # parse a whole game. In quarantine mode, returns False instead of raising if the game fails.
+        # state: a snapshot() taken after parsing an earlier version of the same feed. Parsing
+        #   resumes from it, at play start_play (by default, the first play not parsed yet), so
+        #   re-parsing a refreshed in-progress game only does the new plays
+        # complete_only: stop before the first play that isn't complete yet (e.g. the at-bat in
+        #   progress), so that it is parsed in full on a later refresh rather than half now
+        return self._guarded(self._parse_game, gd, start_play, state, complete_only)
+
+    def _parse_game(self, gd, start_play, state, complete_only):
+        self._start_game(gd)
+        start_play = self._resume(start_play, state)
+        self.parse_plays(gd["liveData"]["plays"]["allPlays"], start_play, complete_only)
+        self.flush_block()
+
+    def _start_game(self, gd):
+        if self.stats is None:
+            self.start_game(gd)
+        else:
+            with self.stats.timer("game_setup"):
+                self.start_game(gd)
+
+    def _resume(self, start_play, state):
+        # restore the game state from a snapshot (after start_game has read the refreshed header,
+        # so the player index and inning scores are up to date). Returns the play to start at
+        if state is None:
+            if start_play:
+                raise Exception("Can only start a game at play {0} given a snapshot of the state before it".format(start_play))
+            return 0
+        if state["parser_version"] != self.parser_version:
+            raise Exception("Snapshot is from parser version {0}, this is version {1}".format(
+                state["parser_version"], self.parser_version))
+        if state["gamePk"] != self.game_state.gamePk:
+            raise Exception("Snapshot is of gamePk {0}, not {1}".format(state["gamePk"], self.game_state.gamePk))
+        self.game_state = GameState.from_snapshot(state["game_state"])
+        self.next_play = state["next_play"] if start_play is None else start_play
+        return self.next_play
+
+    def snapshot(self):
+        # json-serializable state of the parser after the last parsed play, to pass as parse_game(state=...)
+        return {
+            "parser_version" : self.parser_version,
+            "gamePk" : self.game_state.gamePk,
+            "next_play" : self.next_play,
+            "game_state" : self.game_state.snapshot(),
+            }
+
+    def start_game(self, gd):
+        # set up the game state from the game-level info (everything but the plays)
         g = gd["gameData"]
         print g["game"]["id"], g["game"]["pk"], g["datetime"]["dateTime"]
 
@@ -412,6 +497,7 @@ class GameJSONParser:
         self.game_state.away_team = g["teams"]["away"]["teamCode"]
         self.game_state.home_team = g["teams"]["home"]["teamCode"]
         self.game_state.DH = int(g["game"]["id"].split("-")[-1])
+        self.index_players(g.get("players", {}))
 
         # get HP umpire
         ld = gd["liveData"]
@@ -431,12 +517,99 @@ class GameJSONParser:
                 ch += inn["home"]["runs"]
             self.inning_scores[("bottom",inn["num"])] = (ca,ch)
 
-        # loop over all plays
-        for play in ld["plays"]["allPlays"]:
+    def parse_plays(self, plays, start_play=0, complete_only=False):
+        # loop over all plays (from start_play on)
+        st = self.stats
+        for i,play in enumerate(plays):
+            if i < start_play:
+                continue
+            if complete_only and not play["about"].get("isComplete", True):
+                break
             if play["result"]["type"] == "atBat":
-                self.process_atbat(play)
+                if st is None:
+                    self.process_atbat(play)
+                else:
+                    t0 = time.time()
+                    self.process_atbat(play)
+                    st.add_time("atbat", time.time()-t0)
+                    st.count("atbats")
             else:
-                raise Exception("Unknown play type "+events["result"]["type"])
+                raise Exception("Unknown play type "+play["result"]["type"])
+            self.next_play = i+1
+
+    def parse_game_stream(self, fname, zdict=None, start_play=None, state=None, complete_only=False):
+        # same as parse_game(load_game(fname), ...), but the feed is read incrementally, one play at a
+        # time, so that memory use doesn't grow with the size of the feed (needs ijson)
+        return self._guarded(self._parse_game_stream, fname, zdict, start_play, state, complete_only)
+
+    def _parse_game_stream(self, fname, zdict, start_play, state, complete_only):
+        header, plays = stream_game(fname, self.feed_paths[:-1], self.feed_paths[-1], zdict)
+        self._start_game(header)
+        start_play = self._resume(start_play, state)
+        self.parse_plays(plays, start_play, complete_only)
+        self.flush_block()
+
+    def flush_block(self):
+        # hand the pitches collected so far to the output (in batch mode)
+        if self.block is None or len(self.block) == 0:
+            return
+        if self.stats is None:
+            self.output.add_entries(self.block)
+        else:
+            with self.stats.timer("add_entry"):
+                self.output.add_entries(self.block)
+        self.block.clear()
+
+    def _guarded(self, parse, *args):
+        # run a game parse; in quarantine mode a failing game has its rows rolled back, and is
+        # logged and skipped
+        self.game_state = GameState()
+        self.next_play = 0
+        if self.block is not None:
+            # drop the pitches of a game that failed part way
+            self.block.clear()
+        st = self.stats
+        if st is not None:
+            st.start_game()
+        mark = self.output.mark() if self.quarantine else None
+        try:
+            parse(*args)
+        except Exception as e:
+            if st is not None:
+                st.end_game(self.game_state, ok=False)
+            if not self.quarantine:
+                raise
+            self.output.rollback(mark)
+            self.quarantine_game(e)
+            return False
+        if st is not None:
+            st.end_game(self.game_state)
+        return True
+
+    def quarantine_game(self, error):
+        gs = self.game_state
+        entry = {
+            "gamePk" : gs.gamePk,
+            "gid" : gs.gid,
+            "date" : gs.date.strftime("%Y-%m-%d"),
+            "inning" : gs.inning,
+            "half" : gs.half,
+            "abidx" : gs.abidx,
+            "batter" : gs.batter,
+            "pitcher" : gs.pitcher,
+            "balls" : gs.b,
+            "strikes" : gs.s,
+            "outs" : gs.o,
+            "bases" : [gs.first, gs.second, gs.third],
+            "error" : "{0}: {1}".format(type(error).__name__, error),
+            "traceback" : traceback.format_exc(),
+            }
+        print "QUARANTINED gamePk {0} ({1}), {2} {3}, atBatIndex {4}: {5}".format(
+            gs.gamePk, gs.gid, gs.half, gs.inning, gs.abidx, entry["error"])
+        self.quarantined.append(entry)
+        if self.quarantine_log is not None:
+            with open(self.quarantine_log, 'a') as fid:
+                fid.write(json.dumps(entry, sort_keys=True) + "\n")
 
 
 if __name__=="__main__":
@@ -1,6 +1,9 @@
 #
 # Simple object for storing all info about the current state of the game
 #
+# snapshot() turns it into a json-serializable dict, and GameState.from_snapshot() back,
+# e.g. to save the state after the last parsed play of an in-progress game
+#
 
 import datetime as dt
 
@@ -38,3 +41,21 @@ class GameState:
         self.event = ""
         self.pitch_counts = {}
         self.cur_pc = 0
+
+    def snapshot(self):
+        d = dict(self.__dict__)
+        d["date"] = self.date.strftime("%Y-%m-%dT%H:%M:%S")
+        # json object keys must be strings, so store the pitch counts as [pitcher, count] pairs
+        d["pitch_counts"] = sorted([pid, n] for pid,n in self.pitch_counts.items())
+        return d
+
+    @staticmethod
+    def from_snapshot(d):
+        gs = GameState()
+        for k,v in d.items():
+            if k not in gs.__dict__:
+                raise Exception("Unknown GameState field in snapshot: "+k)
+            setattr(gs, k, v)
+        gs.date = dt.datetime.strptime(d["date"], "%Y-%m-%dT%H:%M:%S")
+        gs.pitch_counts = {pid:n for pid,n in d["pitch_counts"]}
+        return gs
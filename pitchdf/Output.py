@@ -1,3 +1,6 @@
+import numpy as np
+from PitchInfo import PitchInfo
+
 class Output:
     def __init__(self):
         print "Shouldn't call this! Use one of the derived classes"
@@ -5,6 +8,23 @@ class Output:
     def add_entry(self, game_state, pitch):
         pass
 
+    # whether add_entries is implemented natively. If not, the parser sticks to add_entry
+    supports_batch = False
+
+    def add_entries(self, block):
+        # add all the pitches of a PitchBlock. Fallback: one add_entry per pitch
+        for game_state, pitch in block.entries():
+            self.add_entry(game_state, pitch)
+
+    # whether rows added since mark() can be dropped with rollback() (needed for quarantine mode)
+    supports_rollback = False
+
+    def mark(self):
+        return None
+
+    def rollback(self, mark):
+        raise Exception("{0} can't roll back rows".format(type(self).__name__))
+
     _unique_pitch_types = [
         'UN', 'SI', 'SL', 'FF', 'FC', 'CU', 'CH', 'FT', 'FS', 'KC', 
         'EP', 'FO', 'PO', 'SC', 'KN', 'AB', 'IN', 'FA'
@@ -36,11 +56,33 @@ class Output:
                 raise Exception("Unknown strike description: "+pitch.des)
         return st
         
+    @staticmethod
+    def get_strike_types(types, des):
+        # get_strike_type of many pitches at once, given their types and descriptions.
+        # Each distinct (type, description) pair is only classified once
+        if len(types) == 0:
+            return np.array([], dtype=object)
+        pairs = np.char.add(np.char.add(np.array(types, dtype=unicode), u"|"), np.array(des, dtype=unicode))
+        uniq, inverse = np.unique(pairs, return_inverse=True)
+        sts = [Output.get_strike_type(PitchInfo(None, d, t, None, None)) for t,d in (u.split(u"|",1) for u in uniq)]
+        return np.array(sts, dtype=object)[inverse]
+
+    _last_strike_types = ['S','C','FB','FT','MB']
+
+    @staticmethod
+    def are_last_pitches(types, des, strike_types, balls, strikes):
+        # is_last_pitch of many pitches at once (balls and strikes are the counts before each pitch)
+        types = np.array(types, dtype=object)
+        return (types == 'X') | \
+            ((types == 'B') & (balls == 3)) | \
+            (np.isin(strike_types, Output._last_strike_types) & (strikes == 2)) | \
+            (np.array(des, dtype=object) == "Hit By Pitch")
+
     @staticmethod
     def is_last_pitch(game_state, pitch):
         if pitch.type=='X' or \
                 (pitch.type=='B' and game_state.b==3) or \
-                (Output.get_strike_type(pitch) in ['S','C','FB','FT','MB'] and game_state.s==2) or \
+                (Output.get_strike_type(pitch) in Output._last_strike_types and game_state.s==2) or \
                 pitch.des=="Hit By Pitch":
             return True
         return False
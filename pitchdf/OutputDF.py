@@ -1,8 +1,9 @@
 import numpy as np
 import pandas as pd
 import cPickle as pickle
-import gzip
+import os, gzip
 from Output import Output
+from PitchInfo import PitchInfo
 
 class OutputDF(Output):
     _columns = [
@@ -76,109 +77,349 @@ class OutputDF(Output):
         ("hit_hardness",      "category"),
         ]
 
-    def __init__(self, output_file):
+    # PitchInfo fields whose column is named differently
+    _field_columns = {"type_confidence":"type_conf"}
+
+    # Rows are stored in preallocated typed buffers, one 2D array per dtype with a row per column,
+    # which add_entry fills one column (i.e. one table row) of at a time and which double in size
+    # when full. Categorical columns are stored as integer codes into per-column lists of
+    # categories, interned as rows arrive. Buffers: (name, dtype, columns in the order add_entry fills them)
+    _buffers = [
+        ("date",  "datetime64[ns]", ["date"]),
+        ("u8",    "uint8",   ["DH", "inning", "abidx", "pitchidx", "balls", "strikes", "outs", "base_state",
+                              "pitch_count", "home_score", "away_score", "home_score_afterAB",
+                              "away_score_afterAB", "home_score_afterInn", "away_score_afterInn"]),
+        ("u32",   "uint32",  ["gamePk", "batter", "pitcher"]),
+        ("i32",   "int32",   ["runner_first", "runner_second", "runner_third", "umpire"]),
+        ("bool",  "bool",    ["is_last_pitch"]),
+        ("f32",   "float32", [_field_columns.get(f,f) for f in PitchInfo.float_fields]),
+        ("i8",    "int8",    ["zone", "hit_location"]),
+        ("i16",   "int16",   ["nasty"]),
+        ("codes", "int32",   ["away_team", "home_team", "half", "BH", "PH", "event", "des",
+                              "strike_type", "pitch_type", "hit_hardness", "hit_trajectory"]),
+        ]
+    _buffer_cols = {name:cols for name,typ,cols in _buffers}
+    _initial_capacity = 4096
+    # whether write() goes through the rows a chunk at a time (see chunk_rows)
+    streams_chunks = False
+    _row_bytes = sum(np.dtype(typ).itemsize*len(cols) for name,typ,cols in _buffers)
+
+    def __init__(self, output_file, chunk_rows=None, chunk_mb=None, chunk_dir=None):
+        # chunk_rows, chunk_mb: chunked mode. Once this many rows (or megabytes of rows) are held,
+        #   they are flushed to a fragment file at the start of the next game, so that memory use while
+        #   parsing is bounded by the chunk size rather than the size of the run. write() then reads the
+        #   fragments back and deletes them. OutputCSV writes them out one at a time, so its write is
+        #   bounded too; OutputDF has to build the whole dataframe to pickle it (about twice the size
+        #   of the rows, as without chunking)
+        # chunk_dir: directory for the fragments (default: <output_file>.chunks)
         self._output_file = output_file
-        self._data = {col:[] for col in zip(*self._columns)[0]}
-                
+        self._n = 0
+        # rows already flushed to fragments, and the fragment files
+        self._flushed = 0
+        self._fragments = []
+        self._flush_at = float("inf")
+        if chunk_rows is not None:
+            self._flush_at = min(self._flush_at, chunk_rows)
+        if chunk_mb is not None:
+            self._flush_at = min(self._flush_at, max(1, int(chunk_mb*1024*1024) // self._row_bytes))
+        self.chunked = self._flush_at != float("inf")
+        if self.chunked:
+            if chunk_dir is None:
+                if output_file is None:
+                    raise Exception("a chunked OutputDF needs an output_file or a chunk_dir")
+                chunk_dir = output_file + ".chunks"
+            if not self.streams_chunks:
+                print "WARNING: a chunked {0} only bounds memory while parsing; write() still builds " \
+                      "the whole dataframe (OutputCSV writes a chunk at a time)".format(self.__class__.__name__)
+        self._chunk_dir = chunk_dir
+        self._capacity = self._initial_capacity
+        self._bufs = {name:np.empty((len(cols), self._capacity), dtype=typ) for name,typ,cols in self._buffers}
+        self._alias_bufs()
+        # for each categorical column, value -> code and the list of values (missing values get code -1)
+        ncat = len(self._bufs["codes"])
+        self._cat_index = [{None:-1} for i in range(ncat)]
+        self._categories = [[] for i in range(ncat)]
+        self._last_date = None
+
+    def _alias_bufs(self):
+        for name in self._bufs:
+            setattr(self, "_"+name, self._bufs[name])
+
+    def _grow(self, need):
+        # reallocate the buffers to hold at least need rows
+        cap = self._capacity
+        while cap < need:
+            cap *= 2
+        for name,buf in self._bufs.items():
+            new = np.empty((buf.shape[0], cap), dtype=buf.dtype)
+            new[:, :self._n] = buf[:, :self._n]
+            self._bufs[name] = new
+        self._capacity = cap
+        self._alias_bufs()
+
+    def _intern(self, i, value):
+        # the code of value in categorical column i, adding it as a new category if needed
+        code = self._cat_index[i].get(value)
+        if code is None:
+            code = len(self._categories[i])
+            self._categories[i].append(value)
+            self._cat_index[i][value] = code
+        return code
+
+    _IDX_ZONE = PitchInfo.IDX_ZONE
+    _IDX_NASTY = PitchInfo.IDX_NASTY
+    _IDX_HIT_LOCATION = PitchInfo.IDX_HIT_LOCATION
+    _IDX_HIT_HARDNESS = PitchInfo.IDX_HIT_HARDNESS
+    _IDX_HIT_TRAJECTORY = PitchInfo.IDX_HIT_TRAJECTORY
+    _NFLOAT = len(PitchInfo.float_fields)
+
     def add_entry(self, game_state, pitch):
-        
-        self._data["date"] +=        [game_state.date]
-        self._data["gamePk"] +=      [game_state.gamePk]
-        self._data["DH"] +=          [game_state.DH]
-        self._data["away_team"] +=   [game_state.away_team]
-        self._data["home_team"] +=   [game_state.home_team]
-        self._data["inning"] +=      [game_state.inning]
-        self._data["half"] +=        [game_state.half]
-        self._data["abidx"] +=       [game_state.abidx]
-        self._data["pitchidx"] +=    [pitch.pitchidx]
-        self._data["balls"] +=       [game_state.b]
-        self._data["strikes"] +=     [game_state.s]
-        self._data["outs"] +=        [game_state.o]
-        self._data["base_state"] +=  [game_state.base_state]
-        self._data["batter"] +=      [game_state.batter]
-        self._data["pitcher"] +=     [game_state.pitcher]
-        self._data["BH"] +=          [game_state.BH]
-        self._data["PH"] +=          [game_state.PH]
-        self._data["pitch_count"] += [game_state.cur_pc]
-        self._data["home_score"] +=  [game_state.home_score]
-        self._data["away_score"] +=  [game_state.away_score]
-        self._data["home_score_afterAB"]  += [game_state.home_score_afterAB]
-        self._data["away_score_afterAB"]  += [game_state.away_score_afterAB]
-        self._data["home_score_afterInn"] += [game_state.home_score_afterInn]
-        self._data["away_score_afterInn"] += [game_state.away_score_afterInn]
-        self._data["runner_first"] +=  [game_state.first]
-        self._data["runner_second"] += [game_state.second]
-        self._data["runner_third"] +=  [game_state.third]
-        self._data["umpire"] +=        [game_state.umpire]
-        self._data["is_last_pitch"] += [Output.is_last_pitch(game_state,pitch)]
-        self._data["event"] +=        [game_state.event]
-        self._data["des"] +=          [pitch.des]
-        self._data["strike_type"] +=  [Output.get_strike_type(pitch)]
-        self._data["pitch_type"] +=   [pitch.pitch_type] 
-        self._data["x"] +=            [float(getattr(pitch,"x",-9999))]
-        self._data["y"] +=            [float(getattr(pitch,"y",-9999))]
-        self._data["pfx_x"] +=        [float(getattr(pitch,"pfx_x",-9999))]
-        self._data["pfx_z"] +=        [float(getattr(pitch,"pfx_z",-9999))]
-        self._data["px"] +=           [float(getattr(pitch,"px",-9999))]
-        self._data["pz"] +=           [float(getattr(pitch,"pz",-9999))]
-        self._data["start_speed"] +=  [float(getattr(pitch,"start_speed",-9999))]
-        self._data["end_speed"] +=    [float(getattr(pitch,"end_speed",-9999))]
-        self._data["sz_top"] +=       [float(getattr(pitch,"sz_top",-9999))]
-        self._data["sz_bot"] +=       [float(getattr(pitch,"sz_bot",-9999))]
-        self._data["x0"] +=           [float(getattr(pitch,"x0",-9999))]
-        self._data["y0"] +=           [float(getattr(pitch,"y0",-9999))]
-        self._data["z0"] +=           [float(getattr(pitch,"z0",-9999))]
-        self._data["vx0"] +=          [float(getattr(pitch,"vx0",-9999))]
-        self._data["vy0"] +=          [float(getattr(pitch,"vy0",-9999))]
-        self._data["vz0"] +=          [float(getattr(pitch,"vz0",-9999))]
-        self._data["ax"] +=           [float(getattr(pitch,"ax",-9999))]
-        self._data["ay"] +=           [float(getattr(pitch,"ay",-9999))]
-        self._data["az"] +=           [float(getattr(pitch,"az",-9999))]
-        self._data["break_y"] +=      [float(getattr(pitch,"break_y",-9999))]
-        self._data["break_angle"] +=  [float(getattr(pitch,"break_angle",-9999))]
-        self._data["break_length"] += [float(getattr(pitch,"break_length",-9999))]
-        self._data["type_conf"] +=    [float(getattr(pitch,"type_confidence",-9999))]
-        self._data["zone"] +=         [int(getattr(pitch,"zone",-1))]
-        self._data["nasty"] +=        [int(getattr(pitch,"nasty",-1))]
-        self._data["spin_dir"] +=     [float(getattr(pitch,"spin_dir",-9999))]
-        self._data["spin_rate"] +=    [float(getattr(pitch,"spin_rate",-9999))]
-        self._data["hit_x"] +=        [float(getattr(pitch,"hit_x",-9999))]
-        self._data["hit_y"] +=        [float(getattr(pitch,"hit_y",-9999))]
-        self._data["hit_launchAngle"] +=   [float(getattr(pitch,"hit_launchAngle",-9999))]
-        self._data["hit_launchSpeed"] +=   [float(getattr(pitch,"hit_launchSpeed",-9999))]
-        self._data["hit_totalDistance"] += [float(getattr(pitch,"hit_totalDistance",-9999))]
-        self._data["hit_location"] +=      [int(getattr(pitch,"hit_location",-1))]
-        self._data["hit_trajectory"] +=    [getattr(pitch,"hit_trajectory","NONE")]
-        self._data["hit_hardness"] +=      [getattr(pitch,"hit_hardness","NONE")]
-               
-    def create_df(self):
-        # turn dictionary in to dataframe
-        self._df = pd.DataFrame.from_dict(self._data)
-        # cast to correct types
-        dcols = dict(self._columns)
-        for col,typ in dcols.items():
-            self._df[col] = self._df[col].astype(typ)
+        n = self._n
+        if n >= self._flush_at and game_state.gamePk != self._u32[0, n-1]:
+            # the first pitch of a new game
+            self.flush()
+            n = 0
+        if n == self._capacity:
+            self._grow(n+1)
+        gs = game_state
+        values = pitch.values
+
+        if gs.date is not self._last_date:
+            # converting a datetime is slow, and it only changes once per game
+            self._last_date = gs.date
+            self._last_date64 = np.datetime64(gs.date, "ns")
+        self._date[0, n] = self._last_date64
+        self._u8[:, n] = (gs.DH, gs.inning, gs.abidx, pitch.pitchidx, gs.b, gs.s, gs.o, gs.base_state,
+                          gs.cur_pc, gs.home_score, gs.away_score, gs.home_score_afterAB,
+                          gs.away_score_afterAB, gs.home_score_afterInn, gs.away_score_afterInn)
+        self._u32[:, n] = (gs.gamePk, gs.batter, gs.pitcher)
+        self._i32[:, n] = (gs.first, gs.second, gs.third, gs.umpire)
+        self._bool[0, n] = Output.is_last_pitch(gs, pitch)
+        # measured quantities, in the positional order of PitchInfo.fields
+        self._f32[:, n] = values[:self._NFLOAT]
+        self._i8[:, n] = (values[self._IDX_ZONE], values[self._IDX_HIT_LOCATION])
+        self._i16[0, n] = values[self._IDX_NASTY]
+
+        cats = (gs.away_team, gs.home_team, gs.half, gs.BH, gs.PH, gs.event, pitch.des,
+                Output.get_strike_type(pitch), pitch.pitch_type,
+                values[self._IDX_HIT_HARDNESS], values[self._IDX_HIT_TRAJECTORY])
+        try:
+            self._codes[:, n] = [index[v] for index,v in zip(self._cat_index, cats)]
+        except KeyError:
+            # a value not seen before
+            self._codes[:, n] = [self._intern(i, v) for i,v in enumerate(cats)]
+        self._n = n+1
+
+    supports_batch = True
+
+    # columns whose PitchBlock field is named differently
+    _block_fields = {"balls":"b", "strikes":"s", "outs":"o", "pitch_count":"cur_pc",
+                     "runner_first":"first", "runner_second":"second", "runner_third":"third"}
+
+    def add_entries(self, block):
+        # add a whole PitchBlock, a column at a time
+        m = len(block)
+        if m == 0:
+            return
+        if self._n >= self._flush_at:
+            self.flush()
+        n = self._n
+        if n+m > self._capacity:
+            self._grow(n+m)
+        game = block.game
+
+        self._date[0, n:n+m] = np.datetime64(game["date"], "ns")
+        for name in ["u8", "u32", "i32", "i8", "i16"]:
+            buf = self._bufs[name]
+            for i,col in enumerate(self._buffer_cols[name]):
+                f = self._block_fields.get(col, col)
+                buf[i, n:n+m] = game[f] if f in game else block.int_column(f)
+        self._bool[0, n:n+m] = block.is_last_pitch()
+        self._f32[:, n:n+m] = block.floats().T
+
+        for i,col in enumerate(self._buffer_cols["codes"]):
+            if col in game:
+                self._codes[i, n:n+m] = self._intern(i, game[col])
+                continue
+            vals = block.strike_types() if col == "strike_type" else block.str_column(col)
+            index = self._cat_index[i]
+            try:
+                self._codes[i, n:n+m] = [index[v] for v in vals]
+            except KeyError:
+                # a value not seen before
+                self._codes[i, n:n+m] = [self._intern(i, v) for v in vals]
+        self._n = n+m
+
+    def nrows(self):
+        # rows added so far, including those flushed to fragments
+        return self._flushed + self._n
+
+    def flush(self):
+        # move the rows held in memory to a new fragment file (chunked mode). Called by the add
+        # methods before a new game once the chunk is full, so fragments hold whole games
+        if self._n == 0:
+            return
+        if not os.path.isdir(self._chunk_dir):
+            os.makedirs(self._chunk_dir)
+        fname = os.path.join(self._chunk_dir, "chunk_{0:05d}.npz".format(len(self._fragments)))
+        # (categories are only ever appended to, so the codes stay valid for the whole run)
+        np.savez(fname, **{name:buf[:, :self._n] for name,buf in self._bufs.items()})
+        self._fragments.append(fname)
+        self._flushed += self._n
+        self._n = 0
+
+    def _chunks(self):
+        # the rows, a chunk at a time: each fragment, then the rows in memory, as {buffer name: 2D array}
+        for fname in self._fragments:
+            frag = np.load(fname)
+            yield {name:frag[name] for name in self._bufs}
+            frag.close()
+        yield {name:buf[:, :self._n] for name,buf in self._bufs.items()}
+
+    def remove_chunks(self):
+        # delete the fragment files and empty the output (done by write() in chunked mode)
+        for fname in self._fragments:
+            os.remove(fname)
+        if self._chunk_dir is not None and os.path.isdir(self._chunk_dir) and not os.listdir(self._chunk_dir):
+            os.rmdir(self._chunk_dir)
+        self._fragments = []
+        self._flushed = 0
+        self._n = 0
+
+    def _local(self, row):
+        # index into the in-memory buffers of a row number counted from the start of the run
+        if row < self._flushed:
+            raise Exception("rows before row {0} have already been flushed to disk".format(self._flushed))
+        return row - self._flushed
+
+    supports_rollback = True
+
+    def mark(self):
+        return self.nrows()
+
+    def rollback(self, mark):
+        self.truncate(mark)
+
+    def take_rows(self, start=0, stop=None):
+        # copy of the rows [start,stop), as {"buffers": {name: 2D array}, "categories": [list per categorical column]}
+        start = self._local(start)
+        stop = self._n if stop is None else min(self._local(stop), self._n)
+        return {"buffers" : {name:buf[:, start:stop].copy() for name,buf in self._bufs.items()},
+                "categories" : [list(c) for c in self._categories]}
+
+    def extend_rows(self, rows):
+        # append rows given as returned by take_rows (possibly by another OutputDF)
+        bufs = rows["buffers"]
+        if self._n >= self._flush_at:
+            self.flush()
+        n = self._n
+        m = bufs["codes"].shape[1]
+        if n+m > self._capacity:
+            self._grow(n+m)
+        for name,buf in bufs.items():
+            if name != "codes":
+                self._bufs[name][:, n:n+m] = buf
+        # translate the codes to this output's categories (-1, missing, indexes the last entry)
+        for i,cats in enumerate(rows["categories"]):
+            remap = np.array([self._intern(i, v) for v in cats] + [-1], dtype=np.int32)
+            self._codes[i, n:n+m] = remap[bufs["codes"][i]]
+        self._n = n+m
+
+    def truncate(self, n):
+        # drop all rows after the first n
+        self._n = min(self._local(n), self._n)
+
+    def _make_df(self, bufs):
+        # wrap buffers ({name: 2D array}, as from _chunks) in a dataframe
+        data = {}
+        for name,typ,cols in self._buffers:
+            buf = bufs[name]
+            for i,col in enumerate(cols):
+                if name == "codes":
+                    # categories in sorted order, and only those in use (as astype("category") gives)
+                    cat = pd.Categorical.from_codes(buf[i], self._categories[i]).remove_unused_categories()
+                    data[col] = cat.reorder_categories(sorted(cat.categories))
+                else:
+                    data[col] = buf[i]
         # put columns in correct order
-        self._df = self._df[list(zip(*self._columns)[0])]
+        return pd.DataFrame(data, columns=list(zip(*self._columns)[0]))
 
-    def write(self, use_gzip=True):
-        self.create_df()
+    def create_df(self):
+        if not self._fragments:
+            self._df = self._make_df({name:buf[:, :self._n] for name,buf in self._bufs.items()})
+            return
+        # read the fragments back into one set of buffers, one at a time
+        total = self.nrows()
+        bufs = {name:np.empty((len(cols), total), dtype=typ) for name,typ,cols in self._buffers}
+        n = 0
+        for chunk in self._chunks():
+            m = chunk["codes"].shape[1]
+            for name in bufs:
+                bufs[name][:, n:n+m] = chunk[name]
+            n += m
+        self._df = self._make_df(bufs)
+
+    def _pickle_file(self, use_gzip):
         if use_gzip:
-            self._df.to_pickle(self._output_file+".gz", compression="gzip")
+            return self._output_file+".gz", "gzip"
+        return self._output_file, None
+
+    def existing_gamePks(self, use_gzip=True):
+        # gamePks already in the output file (empty if there's no file yet), e.g. to only parse new games
+        fname, compression = self._pickle_file(use_gzip)
+        if not os.path.exists(fname):
+            return set()
+        return set(pd.read_pickle(fname, compression=compression)["gamePk"].unique())
+
+    def upsert_df(self, old):
+        # merge this output's rows into the dataframe old: its games replace the same gamePks
+        # in old, and new games are added. The result is sorted by date then gamePk.
+        # old is the whole existing file, so this costs as much as rewriting it
+        old = old[~old["gamePk"].isin(self._df["gamePk"].unique())].copy()
+        new = self._df.copy()
+        for col,typ in self._columns:
+            if typ == "category":
+                # concat only keeps a categorical column if the categories match
+                cats = old[col].cat.categories.union(new[col].cat.categories)
+                old[col] = old[col].cat.set_categories(cats)
+                new[col] = new[col].cat.set_categories(cats)
+        df = pd.concat([old, new], ignore_index=True)
+        return df.sort_values(["date","gamePk"], kind="mergesort").reset_index(drop=True)
+
+    def write(self, use_gzip=True, upsert=False):
+        # upsert: merge into an existing output file rather than replacing it (see upsert_df), so that
+        # e.g. last night's games can be added to a season file without re-parsing the season.
+        # The whole file is still read and rewritten each time (a pickle can't be updated in place);
+        # OutputParquet only rewrites the months that have new games
+        self.create_df()
+        fname, compression = self._pickle_file(use_gzip)
+        if upsert and os.path.exists(fname):
+            df = self.upsert_df(pd.read_pickle(fname, compression=compression))
+            # write next to the old file and swap it in, so that a failed write doesn't lose the season
+            df.to_pickle(fname+".tmp", compression=compression)
+            os.rename(fname+".tmp", fname)
         else:
-            self._df.to_pickle(self._output_file)
+            self._df.to_pickle(fname, compression=compression)
+        if self.chunked:
+            self.remove_chunks()
 
     def __del__(self):
         pass
 
 
 class OutputCSV(OutputDF): 
+    streams_chunks = True
+
     def write(self, use_gzip=True):
-        self.create_df()
+        # written a chunk at a time, so in chunked mode the whole run is never in memory at once
         if use_gzip:
-            with gzip.open(self._output_file+".gz", 'wb') as fid:
-                fid.write(self._df.to_csv(index=False))
+            fid = gzip.open(self._output_file+".gz", 'wb')
         else:
-            with open(self._output_file, 'wb') as fid:
-                fid.write(self._df.to_csv(index=False))
+            fid = open(self._output_file, 'wb')
+        with fid:
+            for i,chunk in enumerate(self._chunks()):
+                if i == 0 or chunk["codes"].shape[1] > 0:
+                    fid.write(self._make_df(chunk).to_csv(index=False, header=(i == 0)))
+        if self.chunked:
+            self.remove_chunks()
 
@@ -0,0 +1,95 @@
+#
+# Output to a Parquet dataset partitioned by year and month, for readers that only need some
+# columns or some games. The layout is hive-style:
+#   <output_dir>/year=2019/month=4/part-0.parquet
+# Each game is its own row group, and every column chunk has min/max statistics, so that
+# readers can skip whole files and row groups, e.g.
+#
+#   pd.read_parquet("pitches/", columns=["pitcher","px","pz"], filters=[("year","=",2019)])
+#   pq.ParquetDataset("pitches/", filters=[("month","=",4)]).read(columns=["px"]).to_pandas()
+#
+# Rows are collected in the same buffers as OutputDF, with the same column types (categoricals
+# are stored as dictionary-encoded columns and come back as categoricals). write() replaces the
+# months that it has rows for and leaves the others alone; write(upsert=True) merges the rows
+# into those months instead (as OutputDF.write(upsert=True) does). Needs pyarrow.
+#
+
+import os, shutil
+import numpy as np
+import pandas as pd
+from OutputDF import OutputDF
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+def _require_pyarrow():
+    if pa is None:
+        raise Exception("OutputParquet requires the pyarrow package (pip install pyarrow)")
+
+class OutputParquet(OutputDF):
+    def __init__(self, output_dir, compression="snappy"):
+        _require_pyarrow()
+        OutputDF.__init__(self, output_dir)
+        self.compression = compression
+
+    def _partition_dir(self, year, month):
+        return os.path.join(self._output_file, "year={0}".format(year), "month={0}".format(month))
+
+    def existing_gamePks(self):
+        # gamePks already in the dataset (empty if there's none yet)
+        if not os.path.isdir(self._output_file):
+            return set()
+        return set(pq.ParquetDataset(self._output_file).read(columns=["gamePk"]).column("gamePk").to_pandas().unique())
+
+    def _month_file(self, year, month):
+        return os.path.join(self._partition_dir(year, month), "part-0.parquet")
+
+    def write(self, upsert=False):
+        self.create_df()
+        if len(self._df) == 0:
+            return
+        if upsert:
+            dates = self._df["date"].dt
+            months = set(zip(dates.year, dates.month))
+            fnames = [self._month_file(y, m) for y,m in sorted(months)]
+            old = [pq.read_table(f).to_pandas() for f in fnames if os.path.exists(f)]
+            if old:
+                for col,typ in self._columns:
+                    if typ == "category":
+                        # (each month has its own categories)
+                        cats = reduce(lambda a,b: a.union(b), [o[col].cat.categories for o in old])
+                        for o in old:
+                            o[col] = o[col].cat.set_categories(cats)
+                self._df = self.upsert_df(pd.concat(old, ignore_index=True))
+        df = self._df.sort_values(["date","gamePk"], kind="mergesort").reset_index(drop=True)
+        schema = pa.Schema.from_pandas(df, preserve_index=False)
+
+        dates = df["date"].dt
+        partition = dates.year.values*100 + dates.month.values
+        gamePk = df["gamePk"].values
+        # first row of each month, and of each game
+        month_starts = np.flatnonzero(np.r_[True, partition[1:] != partition[:-1], True])
+        game_starts = np.flatnonzero(np.r_[True, gamePk[1:] != gamePk[:-1], True])
+
+        for start, stop in zip(month_starts[:-1], month_starts[1:]):
+            year, month = divmod(partition[start], 100)
+            pdir = self._partition_dir(year, month)
+            # write the month next to the old one and swap it in, so that a failed write doesn't lose it
+            tmpdir = pdir + ".tmp"
+            if os.path.isdir(tmpdir):
+                shutil.rmtree(tmpdir)
+            os.makedirs(tmpdir)
+            fname = os.path.join(tmpdir, os.path.basename(self._month_file(year, month)))
+            writer = pq.ParquetWriter(fname, schema, version="2.0", compression=self.compression,
+                                      write_statistics=True)
+            games = game_starts[(game_starts >= start) & (game_starts <= stop)]
+            for gstart, gstop in zip(games[:-1], games[1:]):
+                table = pa.Table.from_pandas(df.iloc[gstart:gstop], schema=schema, preserve_index=False)
+                writer.write_table(table, row_group_size=gstop-gstart)
+            writer.close()
+            if os.path.isdir(pdir):
+                shutil.rmtree(pdir)
+            os.rename(tmpdir, pdir)
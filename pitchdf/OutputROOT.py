@@ -1,6 +1,8 @@
 import numpy as np
 import ROOT
 from Output import Output
+from PitchInfo import PitchInfo
+from PitchBlock import PitchBlock
 
 class OutputROOT(Output):
     def __init__(self, output_file):
@@ -217,33 +219,33 @@ class OutputROOT(Output):
         st = Output.get_strike_type(pitch)
         self._strike_type.replace(0, n, st)
 
-        self._x[0] = float(getattr(pitch,"x",-9999))
-        self._y[0] = float(getattr(pitch,"y",-9999))
-        self._start_speed[0] = float(getattr(pitch,"start_speed",-9999))
-        self._end_speed[0] = float(getattr(pitch,"end_speed",-9999))
-        self._sz_top[0] = float(getattr(pitch,"sz_top",-9999))
-        self._sz_bot[0] = float(getattr(pitch,"sz_bot",-9999))
-        self._pfx_x[0] = float(getattr(pitch,"pfx_x",-9999))
-        self._pfx_z[0] = float(getattr(pitch,"pfx_z",-9999))
-        self._px[0] = float(getattr(pitch,"px",-9999))
-        self._pz[0] = float(getattr(pitch,"pz",-9999))
-        self._x0[0] = float(getattr(pitch,"x0",-9999))
-        self._y0[0] = float(getattr(pitch,"y0",-9999))
-        self._z0[0] = float(getattr(pitch,"z0",-9999))
-        self._vx0[0] = float(getattr(pitch,"vx0",-9999))
-        self._vy0[0] = float(getattr(pitch,"vy0",-9999))
-        self._vz0[0] = float(getattr(pitch,"vz0",-9999))
-        self._ax[0] = float(getattr(pitch,"ax",-9999))
-        self._ay[0] = float(getattr(pitch,"ay",-9999))
-        self._az[0] = float(getattr(pitch,"az",-9999))
-        self._break_y[0] = float(getattr(pitch,"break_y",-9999))
-        self._break_angle[0] = float(getattr(pitch,"break_angle",-9999))
-        self._break_length[0] = float(getattr(pitch,"break_length",-9999))
-        self._type_confidence[0] = float(getattr(pitch,"type_confidence",-9999))
-        self._zone[0] = int(getattr(pitch,"zone",-1))
-        self._nasty[0] = int(getattr(pitch,"nasty",-1))
-        self._spin_dir[0] = float(getattr(pitch,"spin_dir",-9999))
-        self._spin_rate[0] = float(getattr(pitch,"spin_rate",-9999))
+        self._x[0] = pitch.x
+        self._y[0] = pitch.y
+        self._start_speed[0] = pitch.start_speed
+        self._end_speed[0] = pitch.end_speed
+        self._sz_top[0] = pitch.sz_top
+        self._sz_bot[0] = pitch.sz_bot
+        self._pfx_x[0] = pitch.pfx_x
+        self._pfx_z[0] = pitch.pfx_z
+        self._px[0] = pitch.px
+        self._pz[0] = pitch.pz
+        self._x0[0] = pitch.x0
+        self._y0[0] = pitch.y0
+        self._z0[0] = pitch.z0
+        self._vx0[0] = pitch.vx0
+        self._vy0[0] = pitch.vy0
+        self._vz0[0] = pitch.vz0
+        self._ax[0] = pitch.ax
+        self._ay[0] = pitch.ay
+        self._az[0] = pitch.az
+        self._break_y[0] = pitch.break_y
+        self._break_angle[0] = pitch.break_angle
+        self._break_length[0] = pitch.break_length
+        self._type_confidence[0] = pitch.type_confidence
+        self._zone[0] = pitch.zone
+        self._nasty[0] = pitch.nasty
+        self._spin_dir[0] = pitch.spin_dir
+        self._spin_rate[0] = pitch.spin_rate
         if pitch.pitch_type not in self._unique_pitch_types:
             print "NEW PITCH:", pitch.pitch_type
             self._unique_pitch_types.append(pitch.pitch_type)
@@ -252,17 +254,68 @@ class OutputROOT(Output):
         self._is_last_pitch[0] = Output.is_last_pitch(game_state, pitch)
 
         # statcast hit data
-        self._hit_x[0] = float(getattr(pitch,"hit_x", -9999))
-        self._hit_y[0] = float(getattr(pitch,"hit_y", -9999))
-        self._hit_launchAngle[0] = float(getattr(pitch,"hit_launchAngle", -9999))
-        self._hit_launchSpeed[0] = float(getattr(pitch,"hit_launchSpeed", -9999))
-        self._hit_totalDistance[0] = float(getattr(pitch,"hit_totalDistance", -9999))
-        self._hit_location[0] = int(getattr(pitch,"hit_location", -1))
-        self._hit_trajectory.replace(0, n, getattr(pitch,"hit_trajectory", "NONE"))
-        self._hit_hardness.replace(0, n, getattr(pitch,"hit_hardness", "NONE"))
+        self._hit_x[0] = pitch.hit_x
+        self._hit_y[0] = pitch.hit_y
+        self._hit_launchAngle[0] = pitch.hit_launchAngle
+        self._hit_launchSpeed[0] = pitch.hit_launchSpeed
+        self._hit_totalDistance[0] = pitch.hit_totalDistance
+        self._hit_location[0] = pitch.hit_location
+        self._hit_trajectory.replace(0, n, pitch.hit_trajectory)
+        self._hit_hardness.replace(0, n, pitch.hit_hardness)
 
         self._t.Fill()
 
+    supports_batch = True
+
+    # branch buffers of the PitchBlock int and string fields
+    _block_int_branches = {"b":"_balls", "s":"_strikes", "o":"_outs", "cur_pc":"_pitch_count",
+                           "first":"_runner_first", "second":"_runner_second", "third":"_runner_third"}
+    _block_str_branches = {"BH":"_batter_hand", "PH":"_pitcher_hand"}
+
+    def add_entries(self, block):
+        # a whole PitchBlock: the game-level branches and the strike type / last pitch
+        # classifications are done once for the block, leaving only the copies into the
+        # branch buffers and the Fill for each pitch
+        if len(block) == 0:
+            return
+        game = block.game
+        date = game["date"]
+        self._year[0] = date.year
+        self._month[0] = date.month
+        self._day[0] = date.day
+        self._hour[0] = date.hour
+        self._minute[0] = date.minute
+        self._DH[0] = game["DH"]
+        self._gamePk[0] = game["gamePk"]
+        n = ROOT.std.string.npos
+        self._gid.replace(0, n, game["gid"])
+        self._away_team.replace(0, n, game["away_team"])
+        self._home_team.replace(0, n, game["home_team"])
+
+        for pt in block.str_column("pitch_type"):
+            if pt not in self._unique_pitch_types:
+                print "NEW PITCH:", pt
+                self._unique_pitch_types.append(pt)
+
+        int_bufs = [getattr(self, self._block_int_branches.get(f, "_"+f)) for f in PitchBlock.int_fields]
+        str_bufs = [getattr(self, self._block_str_branches.get(f, "_"+f)) for f in PitchBlock.str_fields]
+        float_bufs = [getattr(self, "_"+f) for f in PitchInfo.float_fields]
+        ints = block.ints()
+        floats = block.floats()
+        strs = zip(*[block.str_column(f) for f in PitchBlock.str_fields])
+        strike_types = block.strike_types()
+        is_last = block.is_last_pitch()
+        for i in range(len(block)):
+            for buf,v in zip(int_bufs, ints[i]):
+                buf[0] = v
+            for buf,v in zip(float_bufs, floats[i]):
+                buf[0] = v
+            for buf,v in zip(str_bufs, strs[i]):
+                buf.replace(0, n, v)
+            self._strike_type.replace(0, n, strike_types[i])
+            self._is_last_pitch[0] = is_last[i]
+            self._t.Fill()
+
     def write(self):
         self._fout.cd()
         self._t.Write("Pitches",ROOT.TObject.kWriteDelete)
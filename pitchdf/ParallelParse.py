@@ -0,0 +1,98 @@
+#
+# Parse many games in parallel worker processes, and merge the results into one OutputDF.
+#
+# Each worker has its own GameJSONParser writing to its own OutputDF shard. After each game the
+# worker sends that game's rows back, and the main process merges them in (date, gamePk) order,
+# so the merged rows come out in the same order no matter how many workers are used.
+# A game that fails to parse is reported back and skipped, rather than stopping the run.
+#
+#   output = OutputDF("pitches_2019.pkl")
+#   errors = parse_parallel(game_files, output, jobs=8)
+#   output.write()
+#
+
+import os, sys, traceback
+import multiprocessing
+from GameJSONParser import GameJSONParser
+from OutputDF import OutputDF
+from GameArchive import GameArchive
+from GameIO import load_game, read_game_bytes
+from ParseCache import ParseCache
+from DownloadGames import download_single_game
+
+# per-process state of a worker
+_worker = {}
+
+def _init_worker(archive_path, quiet, cache_dir):
+    if quiet:
+        sys.stdout = open(os.devnull, 'w')
+    _worker["output"] = OutputDF(None)
+    _worker["parser"] = GameJSONParser(_worker["output"])
+    _worker["archive"] = GameArchive(archive_path) if archive_path else None
+    _worker["cache"] = ParseCache(cache_dir) if cache_dir else None
+
+def _load(item):
+    # items are filenames of stored games, or gamePks (read from the archive, or downloaded)
+    if isinstance(item, basestring):
+        return load_game(item, paths=GameJSONParser.feed_paths)
+    if _worker["archive"] is not None:
+        return _worker["archive"].read(item, paths=GameJSONParser.feed_paths)
+    return download_single_game(item)
+
+def _parse_one(item):
+    # returns (item, sort key, rows, error)
+    output = _worker["output"]
+    parser = _worker["parser"]
+    start = output.nrows()
+    try:
+        if _worker["cache"] is not None and (isinstance(item, basestring) or _worker["archive"] is not None):
+            # (downloaded games are parsed directly, there are no feed bytes to key the cache on)
+            raw = read_game_bytes(item) if isinstance(item, basestring) else _worker["archive"].read_raw(item)
+            key = _worker["cache"].parse(parser, raw)
+        else:
+            gd = _load(item)
+            if gd is None:
+                return item, None, None, "game could not be loaded"
+            parser.parse_game(gd)
+            key = (parser.game_state.date, parser.game_state.gamePk)
+    except Exception:
+        output.truncate(start)
+        return item, None, None, traceback.format_exc()
+    rows = output.take_rows(start)
+    output.truncate(start)
+    return item, key, rows, None
+
+def parse_parallel(items, output, jobs=None, archive=None, quiet=True, cache_dir=None):
+    # items: list of stored game filenames and/or gamePks
+    # output: OutputDF (or OutputCSV) that the rows of all games are added to
+    # jobs: number of worker processes (default: number of cores)
+    # archive: GameArchive (or path to one) to read gamePks from; if None they are downloaded
+    # quiet: silence the per-game printout of the workers
+    # cache_dir: directory of a ParseCache to reuse the rows of unchanged games from
+    # returns a list of (item, error message) for the games that failed
+    if not isinstance(output, OutputDF):
+        raise TypeError("parse_parallel needs an OutputDF (or derived) output")
+    if jobs is None:
+        jobs = multiprocessing.cpu_count()
+    archive_path = archive.path if isinstance(archive, GameArchive) else archive
+
+    results = []
+    errors = []
+    pool = multiprocessing.Pool(jobs, _init_worker, (archive_path, quiet, cache_dir))
+    try:
+        for item, key, rows, error in pool.imap_unordered(_parse_one, items, chunksize=4):
+            if error is not None:
+                print "ERROR parsing {0}:\n{1}".format(item, error)
+                errors.append((item, error))
+            else:
+                results.append((key, rows))
+    finally:
+        pool.close()
+        pool.join()
+
+    # merge in a fixed order (rows within a game are already in abidx order)
+    results.sort(key=lambda x:x[0])
+    for key, rows in results:
+        output.extend_rows(rows)
+
+    return errors
@@ -0,0 +1,89 @@
+#
+# Content-addressed cache of parsed games, so that re-running a parse only re-parses
+# games that are new, or whose feed or parser changed.
+#
+# Each game's rows are stored as a columnar fragment (OutputDF.take_rows: typed arrays, pickled and
+# zlib-compressed), in <cache_dir>/<key[:2]>/<key>.frag, where the key is a hash of
+#   - the raw feed bytes, and
+#   - the parser's version_key(): GameJSONParser.parser_version, a hash of the data
+#     corrections, and the output type.
+# So a changed feed, a new correction or a bumped parser_version all miss the cache,
+# and nothing ever has to be invalidated by hand. Games that fail to parse are not cached.
+#
+#   cache = ParseCache("parse_cache/")
+#   for fname in game_files:
+#       cache.parse(parser, read_game_bytes(fname))
+#   output.write()
+#
+
+import os, zlib, hashlib
+import cPickle as pickle
+from GameIO import loads
+
+class ParseCache:
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, raw, version_key):
+        h = hashlib.sha1(raw)
+        h.update(version_key)
+        return h.hexdigest()
+
+    def _fname(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".frag")
+
+    def get(self, key):
+        # the cached fragment for key ({"gamePk", "date", "rows"}), or None
+        fname = self._fname(key)
+        if not os.path.exists(fname):
+            return None
+        try:
+            with open(fname, 'rb') as fid:
+                return pickle.loads(zlib.decompress(fid.read()))
+        except Exception:
+            print "WARNING: unreadable parse cache entry {0}, ignoring it".format(fname)
+            return None
+
+    def put(self, key, gamePk, date, rows):
+        fname = self._fname(key)
+        if not os.path.isdir(os.path.dirname(fname)):
+            try:
+                os.makedirs(os.path.dirname(fname))
+            except OSError:
+                # created by another process in the meantime
+                pass
+        frag = {"gamePk" : gamePk, "date" : date, "rows" : rows}
+        # write to a temp file then rename, so that concurrent readers never see a partial entry
+        tmp = "{0}.{1}.tmp".format(fname, os.getpid())
+        with open(tmp, 'wb') as fid:
+            fid.write(zlib.compress(pickle.dumps(frag, pickle.HIGHEST_PROTOCOL), 6))
+        os.rename(tmp, fname)
+
+    def parse(self, parser, raw, paths=None):
+        # add the rows of a game (given as raw feed bytes) to the parser's output (an OutputDF),
+        # from the cache if possible, otherwise by parsing it (and caching the result).
+        # Returns the fragment's (date, gamePk), or None if the game failed (in quarantine mode)
+        output = parser.output
+        key = self.key(raw, parser.version_key())
+        frag = self.get(key)
+        if frag is not None:
+            self.hits += 1
+            output.extend_rows(frag["rows"])
+            return frag["date"], frag["gamePk"]
+
+        self.misses += 1
+        start = output.nrows()
+        if paths is None:
+            paths = parser.feed_paths
+        if parser.stats is not None:
+            with parser.stats.timer("decode"):
+                gd = loads(raw, paths)
+        else:
+            gd = loads(raw, paths)
+        if not parser.parse_game(gd):
+            return None
+        gs = parser.game_state
+        self.put(key, gs.gamePk, gs.date, output.take_rows(start))
+        return gs.date, gs.gamePk
@@ -0,0 +1,86 @@
+#
+# Checkpoints of a long (e.g. full-season) parse into an OutputDF, so that an interrupted run
+# can pick up after the last checkpointed game instead of starting over.
+#
+# Every `every` games, the rows added since the previous checkpoint are appended to the
+# checkpoint file together with the keys (gid, filename, gamePk...) of the games they came from.
+# Only new rows are ever written, so checkpoints stay cheap late in the season. When the
+# checkpoint is opened again, its rows are put back into the output and its games are
+# reported as done. A checkpoint cut off by a crash is ignored.
+#
+#   ckpt = ParseCheckpoint("pitches_2019.ckpt", output)
+#   for fname in game_files:
+#       if fname in ckpt:
+#           continue
+#       parser.parse_game(load_game(fname))
+#       ckpt.game_done(fname)
+#   ckpt.save()
+#   output.write()
+#
+
+import os
+import cPickle as pickle
+
+class ParseCheckpoint:
+    def __init__(self, path, output, every=50):
+        # output: the OutputDF being filled (should still be empty when the checkpoint is opened)
+        self.path = path
+        self.output = output
+        self.every = every
+        self._done = set()
+        self._pending = []
+        if output.nrows() > 0:
+            raise Exception("ParseCheckpoint needs an empty output to restore rows into")
+        if getattr(output, "chunked", False):
+            raise Exception("ParseCheckpoint can't be used with a chunked output (its rows are flushed to disk)")
+
+        good_size = 0
+        if os.path.exists(path):
+            with open(path, 'rb') as fid:
+                while True:
+                    try:
+                        keys, rows = pickle.load(fid)
+                    except EOFError:
+                        break
+                    except Exception:
+                        # cut off by a crash while writing; drop it
+                        print "WARNING: checkpoint {0} ends in an incomplete record, ignoring it".format(path)
+                        break
+                    output.extend_rows(rows)
+                    self._done.update(keys)
+                    good_size = fid.tell()
+            if good_size < os.path.getsize(path):
+                with open(path, 'r+b') as fid:
+                    fid.truncate(good_size)
+            print "Resuming from checkpoint {0}: {1} games, {2} rows".format(path, len(self._done), output.nrows())
+        self._saved_rows = output.nrows()
+
+    def __contains__(self, key):
+        return key in self._done
+
+    def __len__(self):
+        return len(self._done)
+
+    def game_done(self, key):
+        # call after each game is parsed (or quarantined)
+        self._done.add(key)
+        self._pending.append(key)
+        if len(self._pending) >= self.every:
+            self.save()
+
+    def save(self):
+        # write a checkpoint with the games done since the last one
+        if not self._pending:
+            return
+        rows = self.output.take_rows(self._saved_rows)
+        with open(self.path, 'ab') as fid:
+            pickle.dump((self._pending, rows), fid, pickle.HIGHEST_PROTOCOL)
+            fid.flush()
+            os.fsync(fid.fileno())
+        self._saved_rows = self.output.nrows()
+        self._pending = []
+
+    def remove(self):
+        # delete the checkpoint file (e.g. once the final output is written)
+        if os.path.exists(self.path):
+            os.remove(self.path)
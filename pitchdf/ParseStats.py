@@ -0,0 +1,100 @@
+#
+# Timing and counters for GameJSONParser, to see where parse time goes.
+#
+# Off by default: pass a ParseStats to the parser (GameJSONParser(output, stats=ParseStats()))
+# to turn it on. Times are cumulative seconds per phase. Phases nest: "atbat" includes
+# "runners" and "add_entry", and "game" (the whole parse_game call) includes all of them.
+# "decode" and "write" are timed by the driver (e.g. with stats.timer("decode")). When the
+# output takes whole games at once (see PitchBlock), "add_entry" is that one add_entries call
+# per game, outside "atbat".
+#
+#   stats = ParseStats(log_file="parse_stats.jsonl", profile=True)
+#   parser = GameJSONParser(output, stats=stats)
+#   for fname in game_files:
+#       with stats.timer("decode"):
+#           gd = load_game(fname)
+#       parser.parse_game(gd)
+#   with stats.timer("write"):
+#       output.write()
+#   print stats.summary()
+#   stats.print_profile(20)
+#
+
+import time
+import json
+import cProfile
+import pstats
+from contextlib import contextmanager
+
+class ParseStats:
+    phases = ("decode", "game", "game_setup", "atbat", "runners", "add_entry", "write")
+    counters = ("games", "failed", "atbats", "pitches", "actions", "skipped_actions",
+                "runner_entries", "runner_moves", "runner_skips", "runner_retries")
+
+    def __init__(self, log_file=None, profile=False):
+        # log_file: if given, a json line with the times and counts of each game is appended to it
+        # profile: also run cProfile over the game parses (see print_profile/dump_profile)
+        self.log_file = log_file
+        self.times = dict.fromkeys(self.phases, 0.0)
+        self.counts = dict.fromkeys(self.counters, 0)
+        self.game_times = None
+        self.game_counts = None
+        self.profiler = cProfile.Profile() if profile else None
+
+    def add_time(self, phase, t):
+        self.times[phase] += t
+        if self.game_times is not None:
+            self.game_times[phase] += t
+
+    def count(self, name, n=1):
+        self.counts[name] += n
+        if self.game_counts is not None:
+            self.game_counts[name] += n
+
+    @contextmanager
+    def timer(self, phase):
+        t0 = time.time()
+        try:
+            yield
+        finally:
+            self.add_time(phase, time.time()-t0)
+
+    def start_game(self):
+        self.game_times = dict.fromkeys(self.phases, 0.0)
+        self.game_counts = dict.fromkeys(self.counters, 0)
+        self._t0 = time.time()
+        if self.profiler is not None:
+            self.profiler.enable()
+
+    def end_game(self, game_state, ok=True):
+        if self.profiler is not None:
+            self.profiler.disable()
+        self.add_time("game", time.time()-self._t0)
+        self.count("games")
+        if not ok:
+            self.count("failed")
+        if self.log_file is not None:
+            entry = {"gamePk" : game_state.gamePk, "gid" : game_state.gid, "ok" : ok,
+                     "times" : self.game_times, "counts" : self.game_counts}
+            with open(self.log_file, 'a') as fid:
+                fid.write(json.dumps(entry, sort_keys=True) + "\n")
+        self.game_times = None
+        self.game_counts = None
+
+    def summary(self):
+        lines = ["{0:>12s}: {1:9.3f} s".format(p, self.times[p]) for p in self.phases]
+        lines += ["{0:>15s}: {1}".format(c, self.counts[c]) for c in self.counters]
+        if self.counts["pitches"] > 0:
+            lines.append("{0:>15s}: {1:.1f} us".format("per pitch", 1e6*self.times["game"]/self.counts["pitches"]))
+        return "\n".join(lines)
+
+    def print_profile(self, n=30, sort="cumulative"):
+        if self.profiler is None:
+            raise Exception("ParseStats was created without profile=True")
+        pstats.Stats(self.profiler).sort_stats(sort).print_stats(n)
+
+    def dump_profile(self, fname):
+        # write the profile for e.g. snakeviz or pstats
+        if self.profiler is None:
+            raise Exception("ParseStats was created without profile=True")
+        self.profiler.dump_stats(fname)
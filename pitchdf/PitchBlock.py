@@ -0,0 +1,114 @@
+#
+# A block of pitches (with the game state at each one) handed from GameJSONParser to an
+# Output in one go, through Output.add_entries, instead of one add_entry call per pitch.
+#
+# The block collects, for each pitch, a tuple of the integer game state and pitch fields, a tuple
+# of the string ones, and the PitchInfo. Outputs read them back as whole columns (numpy arrays or
+# lists), so that per-pitch work like classifying the strike type is done once per block, with
+# numpy. All the pitches of a block are from the same game (the parser hands over a game at a time).
+#
+#   block = PitchBlock()
+#   block.add(game_state, pitch)     <- for each pitch
+#   output.add_entries(block)
+#   block.clear()
+#
+
+import numpy as np
+from itertools import chain
+from GameState import GameState
+from PitchInfo import PitchInfo
+from Output import Output
+
+class PitchBlock(object):
+    # game-level fields, the same for every pitch (GameState attributes)
+    game_fields = ("date", "gamePk", "gid", "DH", "away_team", "home_team")
+    # per-pitch integer fields: GameState attributes, then PitchInfo ones
+    state_int_fields = ("inning", "abidx", "b", "s", "o", "base_state", "batter", "pitcher", "cur_pc",
+                        "home_score", "away_score", "home_score_afterAB", "away_score_afterAB",
+                        "home_score_afterInn", "away_score_afterInn", "first", "second", "third", "umpire")
+    int_fields = state_int_fields + ("pitchidx",) + PitchInfo.int_fields
+    # per-pitch string fields: GameState attributes, then PitchInfo ones
+    state_str_fields = ("half", "BH", "PH", "event")
+    str_fields = state_str_fields + ("des", "type", "pitch_type") + PitchInfo.str_fields
+
+    _int_index = {f:i for i,f in enumerate(int_fields)}
+    _str_index = {f:i for i,f in enumerate(str_fields)}
+    _IDX_ZONE = PitchInfo.IDX_ZONE
+    _IDX_NASTY = PitchInfo.IDX_NASTY
+    _IDX_HIT_LOCATION = PitchInfo.IDX_HIT_LOCATION
+    _IDX_HIT_HARDNESS = PitchInfo.IDX_HIT_HARDNESS
+    _IDX_HIT_TRAJECTORY = PitchInfo.IDX_HIT_TRAJECTORY
+    _NFLOAT = len(PitchInfo.float_fields)
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.game = None
+        self.pitches = []
+        self._ints = []
+        self._strs = []
+        self._cache = {}
+
+    def __len__(self):
+        return len(self.pitches)
+
+    def add(self, game_state, pitch):
+        gs = game_state
+        if self.game is None:
+            self.game = {f:getattr(gs, f) for f in self.game_fields}
+        values = pitch.values
+        self._ints.append((gs.inning, gs.abidx, gs.b, gs.s, gs.o, gs.base_state, gs.batter, gs.pitcher, gs.cur_pc,
+                           gs.home_score, gs.away_score, gs.home_score_afterAB, gs.away_score_afterAB,
+                           gs.home_score_afterInn, gs.away_score_afterInn, gs.first, gs.second, gs.third, gs.umpire,
+                           pitch.pitchidx, values[self._IDX_ZONE], values[self._IDX_NASTY], values[self._IDX_HIT_LOCATION]))
+        self._strs.append((gs.half, gs.BH, gs.PH, gs.event, pitch.des, pitch.type, pitch.pitch_type,
+                           values[self._IDX_HIT_HARDNESS], values[self._IDX_HIT_TRAJECTORY]))
+        self.pitches.append(pitch)
+        if self._cache:
+            self._cache = {}
+
+    def _cached(self, key, make):
+        if key not in self._cache:
+            self._cache[key] = make()
+        return self._cache[key]
+
+    def ints(self):
+        # (n pitches, len(int_fields)) int64 array
+        k = len(self.int_fields)
+        return self._cached("ints", lambda: np.fromiter(chain.from_iterable(self._ints), np.int64,
+                                                        len(self)*k).reshape(len(self), k))
+
+    def int_column(self, name):
+        return self.ints()[:, self._int_index[name]]
+
+    def floats(self):
+        # (n pitches, len(PitchInfo.float_fields)) float64 array
+        nf = self._NFLOAT
+        return self._cached("floats", lambda: np.fromiter(chain.from_iterable(p.values[:nf] for p in self.pitches),
+                                                          np.float64, len(self)*nf).reshape(len(self), nf))
+
+    def str_column(self, name):
+        # list of the values of a string field
+        cols = self._cached("strs", lambda: zip(*self._strs) if self._strs else [()]*len(self.str_fields))
+        return cols[self._str_index[name]]
+
+    def strike_types(self):
+        # object array of Output.get_strike_type for each pitch
+        return self._cached("strike_types", lambda: Output.get_strike_types(
+            self.str_column("type"), self.str_column("des")))
+
+    def is_last_pitch(self):
+        # bool array of Output.is_last_pitch for each pitch
+        return self._cached("is_last_pitch", lambda: Output.are_last_pitches(
+            self.str_column("type"), self.str_column("des"), self.strike_types(),
+            self.int_column("b"), self.int_column("s")))
+
+    def entries(self):
+        # (game_state, pitch) for each pitch, as they would have been passed to add_entry
+        for ints, strs, pitch in zip(self._ints, self._strs, self.pitches):
+            gs = GameState()
+            gs.__dict__.update(self.game)
+            gs.__dict__.update(zip(self.state_int_fields, ints))
+            gs.__dict__.update(zip(self.state_str_fields, strs))
+            yield gs, pitch
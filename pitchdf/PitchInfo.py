@@ -0,0 +1,115 @@
+#
+# Pitch record passed from GameJSONParser to the Output classes, and the extraction plan that fills it.
+#
+# The measured quantities of a pitch (pitchf/x, statcast) are looked up from a fixed table of
+# (field, sub-dict of the pitch json, key, default). Each sub-dict is looked up once per pitch,
+# and the values are stored positionally in pitch.values, in the order of PitchInfo.fields.
+# Every field is always filled (with its default if missing from the json), so the outputs can
+# read them directly, either by name (pitch.px) or by position.
+#
+
+from operator import itemgetter
+
+# sub-dicts of a pitch json
+PITCHDATA, COORDS, BREAKS, HITDATA, HITCOORDS = range(5)
+
+# (field, source, json key, default), grouped by type
+_float_plan = [
+    ("x",               COORDS,    "x",                -9999),
+    ("y",               COORDS,    "y",                -9999),
+    ("px",              COORDS,    "pX",               -9999),
+    ("pz",              COORDS,    "pZ",               -9999),
+    ("pfx_x",           COORDS,    "pfxX",             -9999),
+    ("pfx_z",           COORDS,    "pfxZ",             -9999),
+    ("x0",              COORDS,    "x0",               -9999),
+    ("y0",              COORDS,    "y0",               -9999),
+    ("z0",              COORDS,    "z0",               -9999),
+    ("vx0",             COORDS,    "vX0",              -9999),
+    ("vy0",             COORDS,    "vY0",              -9999),
+    ("vz0",             COORDS,    "vZ0",              -9999),
+    ("ax",              COORDS,    "aX",               -9999),
+    ("ay",              COORDS,    "aY",               -9999),
+    ("az",              COORDS,    "aZ",               -9999),
+    ("break_y",         BREAKS,    "breakY",           -9999),
+    ("break_angle",     BREAKS,    "breakAngle",       -9999),
+    ("break_length",    BREAKS,    "breakLength",      -9999),
+    ("spin_dir",        BREAKS,    "spinDirection",    -9999),
+    ("spin_rate",       BREAKS,    "spinRate",         -9999),
+    ("start_speed",     PITCHDATA, "startSpeed",       -9999),
+    ("end_speed",       PITCHDATA, "endSpeed",         -9999),
+    ("sz_top",          PITCHDATA, "strikeZoneTop",    -9999),
+    ("sz_bot",          PITCHDATA, "strikeZoneBottom", -9999),
+    ("type_confidence", PITCHDATA, "typeConfidence",   -9999),
+    ("hit_x",           HITCOORDS, "coordX",           -9999),
+    ("hit_y",           HITCOORDS, "coordY",           -9999),
+    ("hit_launchAngle", HITDATA,   "launchAngle",      -9999),
+    ("hit_launchSpeed", HITDATA,   "launchSpeed",      -9999),
+    ("hit_totalDistance", HITDATA, "totalDistance",    -9999),
+    ]
+_int_plan = [
+    ("zone",            PITCHDATA, "zone",             -1),
+    ("nasty",           PITCHDATA, "nastyFactor",      -1),
+    ("hit_location",    HITDATA,   "location",         -1),
+    ]
+_str_plan = [
+    ("hit_hardness",    HITDATA,   "hardness",         "NONE"),
+    ("hit_trajectory",  HITDATA,   "trajectory",       "NONE"),
+    ]
+
+_float_src = [(src, key, default) for name, src, key, default in _float_plan]
+_int_src = [(src, key, default) for name, src, key, default in _int_plan]
+_str_src = [(src, key, default) for name, src, key, default in _str_plan]
+_empty = {}
+
+class PitchInfo(object):
+    # names of the entries of pitch.values, in order
+    fields = tuple(p[0] for p in _float_plan + _int_plan + _str_plan)
+    # the same, by type (values[:len(float_fields)] are the floats, etc.)
+    float_fields = tuple(p[0] for p in _float_plan)
+    int_fields = tuple(p[0] for p in _int_plan)
+    str_fields = tuple(p[0] for p in _str_plan)
+    __slots__ = ("pitchidx", "des", "type", "pitch_type", "values")
+
+    def __init__(self, pitchidx, des, typ, pitch_type, values):
+        self.pitchidx = pitchidx
+        self.des = des
+        self.type = typ
+        self.pitch_type = pitch_type
+        self.values = values
+
+    def __getitem__(self, i):
+        return self.values[i]
+
+# named (read-only) access to the positional values, e.g. pitch.px
+for _i, _name in enumerate(PitchInfo.fields):
+    setattr(PitchInfo, _name, property(itemgetter(_i), doc=_name))
+    setattr(PitchInfo, "IDX_"+_name.upper(), _i)
+
+_AX = PitchInfo.fields.index("ax")
+_BREAK_ANGLE = PitchInfo.fields.index("break_angle")
+
+def extract_pitch(pitch):
+    # fill a PitchInfo from the json of a pitch event
+    details = pitch["details"]
+    des = details["description"]
+    if "type" in details:
+        pitch_type = details["type"]["code"]
+    elif "Automatic Ball" in des:
+        pitch_type = "IN"
+    else:
+        pitch_type = "UN"
+
+    pd = pitch["pitchData"]
+    hd = pitch.get("hitData")
+    srcs = (pd, pd["coordinates"], pd["breaks"],
+            hd if hd is not None else _empty,
+            hd["coordinates"] if hd is not None else _empty)
+    values = [float(srcs[src].get(key, default)) for src, key, default in _float_src]
+    values += [int(srcs[src].get(key, default)) for src, key, default in _int_src]
+    values += [srcs[src].get(key, default) for src, key, default in _str_src]
+
+    # for some reason the break angle is abs() valued in the JSON... correct based on sign of ax
+    if values[_AX] > 0 and values[_BREAK_ANGLE] > -9998:
+        values[_BREAK_ANGLE] *= -1
+
+    return PitchInfo(pitch["pitchNumber"], des, details["call"]["code"], pitch_type, values)
@@ -0,0 +1,136 @@
+#
+# Throttling and retrying of stats-api requests, for large concurrent downloads.
+#
+# A RequestScheduler has the same get(url=...) call as a requests.Session, and can be passed
+# anywhere DownloadGames accepts a session. Each request
+#   - waits for a token from a token bucket (the request rate limit),
+#   - waits for a free slot under the current concurrency limit,
+#   - is retried with exponential backoff and jitter on 429/5xx responses and connection errors.
+# The rate and concurrency limits adapt as requests complete: they creep up while responses are
+# fast and successful, and are cut in half on a 429/5xx/connection error or a slow response.
+#
+
+import time
+import random
+import threading
+import requests
+
+class RequestScheduler:
+    retry_codes = (429, 500, 502, 503, 504)
+
+    def __init__(self, session=None, rate=20.0, max_rate=None, min_rate=0.5,
+                 max_concurrency=8, min_concurrency=1, target_latency=5.0,
+                 max_retries=6, backoff=0.5, max_backoff=60.0, seed=None):
+        # rate: initial requests/second (None for no rate limit); adapts between min_rate and max_rate (default 4*rate)
+        # max_concurrency: most requests in flight at once; adapts down to min_concurrency
+        # target_latency: responses slower than this (seconds) count as a sign of overload
+        # max_retries, backoff, max_backoff: retry up to max_retries times, sleeping
+        #   backoff * 2**attempt seconds (capped at max_backoff, with full jitter) in between
+        self.session = session if session is not None else requests.Session()
+        self.rate = float(rate) if rate else None
+        self.max_rate = float(max_rate) if max_rate else (4*self.rate if self.rate else None)
+        self.min_rate = min_rate
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.concurrency = float(max_concurrency)
+        self.target_latency = target_latency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self._rand = random.Random(seed)
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._tokens = 1.0
+        self._last_refill = time.time()
+
+        self.stats = {"requests":0, "retries":0, "errors":0, "throttled":0}
+
+    def _take_token(self):
+        # block until the token bucket (which holds at most one second's worth) has a token
+        while True:
+            with self._cond:
+                if self.rate is None:
+                    return
+                now = time.time()
+                self._tokens = min(max(1.0, self.rate), self._tokens + (now-self._last_refill)*self.rate)
+                self._last_refill = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                wait = (1.0 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def _acquire_slot(self):
+        with self._cond:
+            while self._in_flight >= max(self.min_concurrency, int(self.concurrency)):
+                self._cond.wait()
+            self._in_flight += 1
+
+    def _release_slot(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def _on_success(self, latency):
+        with self._cond:
+            if latency > self.target_latency:
+                self.concurrency = max(self.min_concurrency, self.concurrency * 0.5)
+            else:
+                # additive increase: about +1 per "window" of concurrency requests
+                self.concurrency = min(self.max_concurrency, self.concurrency + 1.0/max(1.0,self.concurrency))
+                if self.rate is not None:
+                    self.rate = min(self.max_rate, self.rate + 1.0/max(1.0,self.rate))
+            self._cond.notify_all()
+
+    def _on_failure(self, throttled):
+        # multiplicative decrease of both limits
+        with self._cond:
+            self.concurrency = max(self.min_concurrency, self.concurrency * 0.5)
+            if self.rate is not None and throttled:
+                self.rate = max(self.min_rate, self.rate * 0.5)
+            self.stats["throttled" if throttled else "errors"] += 1
+
+    def _retry_delay(self, attempt, r):
+        if r is not None and "Retry-After" in r.headers:
+            try:
+                return float(r.headers["Retry-After"])
+            except ValueError:
+                pass
+        return self._rand.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+
+    def get(self, url, **kwargs):
+        # same as requests.get, with throttling and retries. Once retries are used up, the last
+        # response is returned as-is (so the caller sees its status code), or the last
+        # connection error is re-raised
+        attempt = 0
+        while True:
+            self._take_token()
+            self._acquire_slot()
+            r, error = None, None
+            t0 = time.time()
+            try:
+                r = self.session.get(url=url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error = e
+            finally:
+                self._release_slot()
+            latency = time.time() - t0
+            with self._cond:
+                self.stats["requests"] += 1
+
+            if r is not None and r.status_code not in self.retry_codes:
+                self._on_success(latency)
+                return r
+
+            self._on_failure(throttled = r is not None and r.status_code == 429)
+            if attempt >= self.max_retries:
+                if r is not None:
+                    return r
+                raise error
+            if r is not None:
+                r.close()
+            with self._cond:
+                self.stats["retries"] += 1
+            time.sleep(self._retry_delay(attempt, r))
+            attempt += 1
@@ -0,0 +1,68 @@
+#
+# Local copy of the stats-api schedule, keyed by date.
+# Each date stores the gamePk, gameType, status and teams of its games. A date whose games are
+# all final (and that is in the past) is marked complete and never has to be fetched again.
+#
+
+import os
+import json
+import datetime as dt
+
+class ScheduleCache:
+    def __init__(self, cache_file=None):
+        # if cache_file is None, the cache only lives in memory
+        self.cache_file = cache_file
+        self._dates = {}
+        if cache_file and os.path.exists(cache_file):
+            with open(cache_file) as fid:
+                self._dates = json.load(fid)
+
+    @staticmethod
+    def _key(date):
+        return date.strftime("%Y-%m-%d")
+
+    def is_complete(self, date):
+        entry = self._dates.get(self._key(date))
+        return entry is not None and entry["complete"]
+
+    def has(self, date):
+        return self._key(date) in self._dates
+
+    def games(self, date):
+        # list of game entries for the given date (empty if no games or not cached)
+        entry = self._dates.get(self._key(date))
+        return entry["games"] if entry else []
+
+    def update(self, startdate, enddate, sched_dates, today=None):
+        # store the "dates" list of a schedule response that covered startdate to enddate
+        # (dates with no games are absent from the response, so are stored as empty)
+        if today is None:
+            today = dt.date.today()
+        by_date = {d["date"]:d["games"] for d in sched_dates}
+        date = startdate
+        while date <= enddate:
+            games = []
+            for game in by_date.get(self._key(date), []):
+                games.append({
+                    "gamePk" : game["gamePk"],
+                    "gameType" : game["gameType"],
+                    "status" : game["status"].get("statusCode"),
+                    "final" : game["status"].get("abstractGameState") == "Final",
+                    "away" : game["teams"]["away"]["team"]["id"],
+                    "home" : game["teams"]["home"]["team"]["id"],
+                    })
+            complete = date < today and all(g["final"] for g in games)
+            self._dates[self._key(date)] = {"complete":complete, "games":games}
+            date += dt.timedelta(1)
+
+    def save(self):
+        if not self.cache_file:
+            return
+        dname = os.path.dirname(self.cache_file)
+        if dname and not os.path.isdir(dname):
+            os.makedirs(dname)
+        # write then rename, so a crash mid-write can't corrupt the existing cache
+        tmpfile = self.cache_file + ".tmp"
+        with open(tmpfile, 'w') as fid:
+            json.dump(self._dates, fid, sort_keys=True)
+        os.rename(tmpfile, self.cache_file)
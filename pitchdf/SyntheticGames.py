@@ -0,0 +1,528 @@
+#
+# Generator of synthetic stats-api game feeds, for testing and benchmarking without real data.
+#
+# The games are simulated pitch by pitch, so the feeds are internally consistent in the ways
+# GameJSONParser checks (counts, outs, scores, linescore, runners on base), and have the same
+# structure as real feeds: gameData (game, datetime, status, teams, players),
+# liveData.plays.allPlays (playEvents with pitchData/hitData, runners), liveData.linescore,
+# and liveData.boxscore.officials.
+#
+#   gen = SyntheticGames(seed=1, runner_complexity=0.5, missing_rate=0.05)
+#   gd = gen.game(gamePk=1000, date=dt.date(2019,4,16))
+#   for gd in gen.games(100):
+#       parser.parse_game(gd)
+#
+# The same seed always gives the same games.
+#
+
+import random
+import json
+import datetime as dt
+
+_first_names = ["Aaron", "Carlos", "Jose", "Mike", "Luis", "Chris", "Matt", "Ryan", "Kyle", "Juan",
+                "Tyler", "Nick", "Alex", "Jake", "Josh", "Daniel", "Brandon", "Eric", "Justin", "Adam"]
+_last_names = ["Smith", "Martinez", "Rodriguez", "Johnson", "Garcia", "Miller", "Davis", "Perez", "Brown",
+               "Gonzalez", "Wilson", "Anderson", "Taylor", "Thomas", "Moore", "Jackson", "Lopez", "Hernandez",
+               "Young", "Allen", "Wright", "Scott", "Torres", "Hill", "Nelson", "Baker", "Rivera", "Campbell"]
+_teams = [(108,"ana"),(109,"ari"),(110,"bal"),(111,"bos"),(112,"chn"),(113,"cin"),(114,"cle"),(115,"col"),
+          (116,"det"),(117,"hou"),(118,"kca"),(119,"lan"),(120,"was"),(121,"nyn"),(133,"oak"),(134,"pit"),
+          (135,"sdn"),(136,"sea"),(137,"sfn"),(138,"sln"),(139,"tba"),(140,"tex"),(141,"tor"),(142,"min"),
+          (143,"phi"),(144,"atl"),(145,"cha"),(146,"mia"),(147,"nya"),(158,"mil")]
+_pitch_types = [("FF","Four-Seam Fastball"), ("SL","Slider"), ("CH","Changeup"), ("CU","Curveball"),
+                ("SI","Sinker"), ("FC","Cutter"), ("FT","Two-Seam Fastball"), ("KC","Knuckle Curve")]
+
+# pitch results: (call code, description)
+_ball = ("B", "Ball")
+_ball_dirt = ("*B", "Ball In Dirt")
+_called = ("C", "Called Strike")
+_swinging = ("S", "Swinging Strike")
+_foul = ("F", "Foul")
+_foul_tip = ("T", "Foul Tip")
+_hbp = ("H", "Hit By Pitch")
+_inplay_out = ("X", "In play, out(s)")
+_inplay_noout = ("D", "In play, no out")
+_inplay_runs = ("E", "In play, run(s)")
+
+class SyntheticGames:
+    # plate appearances in a typical 9-inning game, to turn pitches_per_game into pitches_per_pa
+    _pa_per_game = 76.0
+
+    def __init__(self, seed=0, pitches_per_pa=3.9, runner_complexity=0.3, missing_rate=0.02, pitches_per_game=None):
+        # pitches_per_pa: average number of pitches per plate appearance (sets ball/strike/foul rates)
+        # pitches_per_game: if given, overrides pitches_per_pa to get roughly this many pitches per game
+        # runner_complexity: 0-1, how often runner plays beyond the basic ones happen (stolen bases,
+        #   pinch-runners, double plays, extra bases taken, runner entries listed out of order)
+        # missing_rate: fraction of optional pitch fields (pitchData/hitData/pitch type) left out
+        self._rand = random.Random(seed)
+        if pitches_per_game is not None:
+            pitches_per_pa = pitches_per_game / self._pa_per_game
+        self.pitches_per_pa = pitches_per_pa
+        self._p_inplay = self._solve_p_inplay(pitches_per_pa)
+        self.runner_complexity = runner_complexity
+        self.missing_rate = missing_rate
+        self._next_player = 400000
+
+    # per-pitch probabilities of a plate appearance (besides the ball being put in play)
+    _p_hbp = 0.01
+    _p_ball = 0.37
+    _p_foul = 0.35    # of the strikes
+
+    @classmethod
+    def _pa_length(cls, p_inplay):
+        # expected number of pitches in a plate appearance, from the count transitions
+        p_ball = cls._p_ball
+        p_strike = 1.0 - p_inplay - cls._p_hbp - p_ball
+        length = {}
+        for b in [3, 2, 1, 0]:
+            after_ball = length[(b+1,2)] if b < 3 else 0.0
+            # with two strikes a foul leaves the count unchanged
+            length[(b,2)] = (1.0 + p_ball*after_ball) / (1.0 - p_strike*cls._p_foul)
+            for s in [1, 0]:
+                after_ball = length[(b+1,s)] if b < 3 else 0.0
+                length[(b,s)] = 1.0 + p_ball*after_ball + p_strike*length[(b,s+1)]
+        return length[(0,0)]
+
+    @classmethod
+    def _solve_p_inplay(cls, pitches_per_pa):
+        # bisect for the in-play probability giving pitches_per_pa (the length falls as it rises)
+        lo, hi = 0.005, 0.6
+        if not cls._pa_length(hi) <= pitches_per_pa <= cls._pa_length(lo):
+            raise Exception("pitches_per_pa must be between {0:.2f} and {1:.2f}".format(cls._pa_length(hi), cls._pa_length(lo)))
+        for i in range(50):
+            mid = 0.5*(lo+hi)
+            if cls._pa_length(mid) > pitches_per_pa:
+                lo = mid
+            else:
+                hi = mid
+        return 0.5*(lo+hi)
+
+    #
+    # players
+    #
+
+    def _new_player(self, pos):
+        pid = self._next_player
+        self._next_player += 1
+        # names are unique within a game
+        while True:
+            first = self._rand.choice(_first_names)
+            last = self._rand.choice(_last_names)
+            if "{0} {1}".format(first, last) not in self._names:
+                break
+        self._names.add("{0} {1}".format(first, last))
+        self._players["ID{0}".format(pid)] = {
+            "id" : pid,
+            "fullName" : "{0} {1}".format(first, last),
+            "firstName" : first,
+            "lastName" : last,
+            "useName" : first,
+            "boxscoreName" : last,
+            "primaryPosition" : {"abbreviation" : pos},
+            "batSide" : {"code" : self._rand.choice("LRR")},
+            "pitchHand" : {"code" : self._rand.choice("LRR")},
+            }
+        return pid
+
+    def _name(self, pid):
+        return self._players["ID{0}".format(pid)]["fullName"]
+
+    #
+    # pitches
+    #
+
+    def _maybe(self, d, key, value):
+        if self._rand.random() >= self.missing_rate:
+            d[key] = value
+
+    def _pitch_data(self, zone_strike):
+        r = self._rand
+        speed = r.gauss(89, 5)
+        coords = {}
+        for k, v in [("aY", r.gauss(28,3)), ("aZ", r.gauss(-22,8)), ("pfxX", r.gauss(0,6)), ("pfxZ", r.gauss(5,4)),
+                     ("pX", r.gauss(0,0.5) if zone_strike else r.gauss(0,1.3)), ("pZ", r.gauss(2.5,0.5) if zone_strike else r.gauss(2.3,1.1)),
+                     ("vX0", r.gauss(5,4)), ("vY0", -speed*1.46), ("vZ0", r.gauss(-4,2)), ("x", r.gauss(117,30)),
+                     ("y", r.gauss(165,25)), ("x0", r.gauss(-1,1.2)), ("y0", 50.0), ("z0", r.gauss(5.8,0.3)),
+                     ("aX", r.gauss(-5,8))]:
+            self._maybe(coords, k, round(v, 2))
+        breaks = {}
+        for k, v in [("breakAngle", abs(r.gauss(20,15))), ("breakLength", abs(r.gauss(6,3))), ("breakY", 24.0),
+                     ("spinRate", int(r.gauss(2250,250))), ("spinDirection", int(r.uniform(0,360)))]:
+            self._maybe(breaks, k, round(v, 1))
+        pd = {"coordinates" : coords, "breaks" : breaks}
+        for k, v in [("startSpeed", round(speed,1)), ("endSpeed", round(speed*0.92,1)),
+                     ("strikeZoneTop", round(r.gauss(3.4,0.15),2)), ("strikeZoneBottom", round(r.gauss(1.6,0.1),2)),
+                     ("zone", r.randint(1,9) if zone_strike else r.randint(11,14)),
+                     ("typeConfidence", round(r.uniform(0.8,2.0),2)), ("nastyFactor", round(r.uniform(0,100),1))]:
+            self._maybe(pd, k, v)
+        return pd
+
+    def _hit_data(self, result):
+        r = self._rand
+        traj = {"single":"line_drive", "double":"line_drive", "triple":"fly_ball", "home_run":"fly_ball",
+                "groundout":"ground_ball", "double_play":"ground_ball", "flyout":"fly_ball"}[result]
+        hd = {"coordinates" : {"coordX" : round(r.gauss(125,40),2), "coordY" : round(r.gauss(150,40),2)}}
+        for k, v in [("launchSpeed", round(r.gauss(90,12),1)), ("launchAngle", round(r.gauss(12,20),0)),
+                     ("totalDistance", round(abs(r.gauss(250,100)),0)), ("location", str(r.randint(1,9))),
+                     ("hardness", r.choice(["soft","medium","hard"])), ("trajectory", traj)]:
+            self._maybe(hd, k, v)
+        return hd
+
+    def _pitch(self, idx, number, call, balls, strikes, pitch_type):
+        details = {"description" : call[1], "call" : {"code" : call[0], "description" : call[1]},
+                   "isInPlay" : call[0] in "XDE", "isStrike" : call[0] in "CSFTXDE", "isBall" : call[0] in ["B","*B","H"]}
+        if self._rand.random() >= self.missing_rate:
+            details["type"] = {"code" : pitch_type[0], "description" : pitch_type[1]}
+        return {
+            "type" : "pitch",
+            "index" : idx,
+            "pitchNumber" : number,
+            "isPitch" : True,
+            "details" : details,
+            "count" : {"balls" : balls, "strikes" : strikes},
+            "pitchData" : self._pitch_data(call[0] not in ["B","*B"]),
+            }
+
+    def _action(self, idx, event, description, player=None, **extra):
+        d = {
+            "type" : "action",
+            "index" : idx,
+            "isPitch" : False,
+            "details" : {"event" : event, "description" : description},
+            }
+        if player is not None:
+            d["player"] = {"id" : player}
+        d.update(extra)
+        return d
+
+    #
+    # runners
+    #
+
+    def _runner(self, pid, start, end, is_out, event, play_index, scoring=False):
+        return {
+            "movement" : {"start" : start, "end" : end, "isOut" : is_out,
+                          "outBase" : None, "outNumber" : None},
+            "details" : {"event" : event, "runner" : {"id" : pid, "fullName" : self._name(pid)},
+                         "isScoringEvent" : scoring, "playIndex" : play_index, "earned" : scoring},
+            }
+
+    def _advance(self, bases, nbase, event, play_index, forced_only=False, extra_prob=0.0):
+        # move every runner ahead by nbase bases (only the forced ones if forced_only)
+        # bases is [first, second, third] of player ids or None; returns (runner entries, runs)
+        names = ["1B", "2B", "3B"]
+        entries = []
+        runs = 0
+        new = [None, None, None]
+        for b in [2, 1, 0]:
+            pid = bases[b]
+            if pid is None:
+                continue
+            if forced_only:
+                forced = all(bases[x] is not None for x in range(b))
+                adv = 1 if forced else 0
+            else:
+                adv = nbase
+                if adv < 4 and self._rand.random() < extra_prob:
+                    adv += 1
+            dest = b + adv
+            # can't pass (or land on) a runner ahead who stayed put
+            while dest < 3 and new[dest] is not None:
+                dest -= 1
+            if dest == b:
+                new[b] = pid
+                continue
+            if dest >= 3:
+                entries.append(self._runner(pid, names[b], "score", False, event, play_index, True))
+                runs += 1
+            else:
+                entries.append(self._runner(pid, names[b], names[dest], False, event, play_index))
+                new[dest] = pid
+        bases[:] = new
+        return entries, runs
+
+    #
+    # game
+    #
+
+    def _plate_appearance(self, half, inning, state):
+        # simulate one plate appearance; returns the play dict and updates state
+        r = self._rand
+        rc = self.runner_complexity
+        bases = state["bases"]
+        batting = "away" if half == "top" else "home"
+        fielding = "home" if half == "top" else "away"
+        lineup = state["lineup"][batting]
+        batter = lineup[state["order"][batting] % 9]
+        state["order"][batting] += 1
+        events = []
+        runners = []
+        runs = 0
+        outs_before = state["outs"]
+
+        # pitching change every so often, at the start of a PA
+        if state["pitch_count"][fielding] > r.randint(85, 110) or \
+           (state["pitch_count"][fielding] > 20 and r.random() < 0.01):
+            new_pitcher = self._new_player("P")
+            state["pitcher"][fielding] = new_pitcher
+            state["pitch_count"][fielding] = 0
+            events.append(self._action(len(events), "Pitching Substitution",
+                                       "Pitching Change: {0} replaces previous pitcher.".format(self._name(new_pitcher)),
+                                       new_pitcher))
+        pitcher = state["pitcher"][fielding]
+
+        # per-pitch probabilities set so that PAs last about pitches_per_pa pitches
+        p_inplay = self._p_inplay
+        p_hbp = p_inplay + self._p_hbp
+        p_ball = p_hbp + self._p_ball
+        balls, strikes = 0, 0
+        number = 0
+        pitch_type = r.choice(_pitch_types)
+        result = None
+        while result is None:
+            # maybe a stolen base attempt before the pitch
+            if r.random() < 0.05*rc and state["outs"] < 3:
+                if bases[0] is not None and bases[1] is None:
+                    pid = bases[0]
+                    if r.random() < 0.75:
+                        events.append(self._action(len(events), "Stolen Base 2B", "{0} steals (1) 2nd base.".format(self._name(pid)), pid))
+                        runners.append(self._runner(pid, "1B", "2B", False, "Stolen Base 2B", len(events)-1))
+                        bases[0], bases[1] = None, pid
+                    else:
+                        events.append(self._action(len(events), "Caught Stealing 2B", "{0} caught stealing 2nd base.".format(self._name(pid)), pid))
+                        runners.append(self._runner(pid, "1B", None, True, "Caught Stealing 2B", len(events)-1))
+                        bases[0] = None
+                        state["outs"] += 1
+                        if state["outs"] == 3:
+                            result = "inning_over"
+                            break
+            # maybe a pinch-runner
+            occupied = [b for b in range(3) if bases[b] is not None]
+            if occupied and r.random() < 0.01*rc:
+                b = r.choice(occupied)
+                old = bases[b]
+                new = self._new_player("PR")
+                events.append(self._action(len(events), "Offensive Substitution",
+                                           "Offensive Substitution: Pinch-runner {0} replaces {1}.".format(self._name(new), self._name(old)),
+                                           new, replacedPlayer={"id" : old}))
+                bases[b] = new
+                idx = lineup.index(old) if old in lineup else None
+                if idx is not None:
+                    lineup[idx] = new
+
+            x = r.random()
+            number += 1
+            state["pitch_count"][fielding] += 1
+            if r.random() < 0.3:
+                pitch_type = r.choice(_pitch_types)
+            if x < p_inplay:
+                res = r.random()
+                if res < 0.15: result = "single"
+                elif res < 0.20: result = "double"
+                elif res < 0.21: result = "triple"
+                elif res < 0.24: result = "home_run"
+                elif res < 0.55: result = "flyout"
+                elif res < 0.62 and bases[0] is not None and state["outs"] < 2: result = "double_play"
+                else: result = "groundout"
+                if result in ["flyout", "groundout", "double_play"]:
+                    call = _inplay_out
+                elif result == "home_run" or any(b is not None for b in bases[1:]):
+                    call = _inplay_runs
+                else:
+                    call = _inplay_noout
+                pitch = self._pitch(len(events), number, call, balls, strikes, pitch_type)
+                pitch["hitData"] = self._hit_data(result)
+                events.append(pitch)
+            elif x < p_hbp:
+                result = "hit_by_pitch"
+                events.append(self._pitch(len(events), number, _hbp, balls, strikes, pitch_type))
+            elif x < p_ball:
+                balls += 1
+                events.append(self._pitch(len(events), number, _ball if r.random() < 0.85 else _ball_dirt, balls, strikes, pitch_type))
+                if balls == 4:
+                    result = "walk"
+            else:
+                y = r.random()
+                if y < self._p_foul:
+                    call = _foul
+                    if strikes < 2:
+                        strikes += 1
+                else:
+                    call = r.choice([_called, _swinging, _swinging, _foul_tip])
+                    strikes += 1
+                events.append(self._pitch(len(events), number, call, balls, strikes, pitch_type))
+                if strikes == 3:
+                    result = "strikeout"
+
+        pidx = len(events) - 1
+        if result == "inning_over":
+            event_name = "Caught Stealing 2B"
+            # the batter's PA doesn't count; he'll lead off next inning
+            state["order"][batting] -= 1
+        elif result == "strikeout":
+            event_name = "Strikeout"
+            runners.append(self._runner(batter, None, None, True, "Strikeout", pidx))
+            state["outs"] += 1
+        elif result in ["walk", "hit_by_pitch"]:
+            event_name = "Walk" if result == "walk" else "Hit By Pitch"
+            ents, n = self._advance(bases, 1, event_name, pidx, forced_only=True)
+            runners += ents
+            runs += n
+            runners.append(self._runner(batter, None, "1B", False, event_name, pidx))
+            bases[0] = batter
+        elif result in ["single", "double", "triple", "home_run"]:
+            nbase = {"single":1, "double":2, "triple":3, "home_run":4}[result]
+            event_name = {"single":"Single", "double":"Double", "triple":"Triple", "home_run":"Home Run"}[result]
+            ents, n = self._advance(bases, nbase, event_name, pidx, extra_prob=0.4*rc)
+            runners += ents
+            runs += n
+            if nbase == 4:
+                runners.append(self._runner(batter, None, "score", False, event_name, pidx, True))
+                runs += 1
+            else:
+                runners.append(self._runner(batter, None, ["1B","2B","3B"][nbase-1], False, event_name, pidx))
+                bases[nbase-1] = batter
+        elif result == "flyout":
+            event_name = "Flyout"
+            runners.append(self._runner(batter, None, None, True, event_name, pidx))
+            state["outs"] += 1
+            # runner on third tags up
+            if state["outs"] < 3 and bases[2] is not None and r.random() < 0.5:
+                event_name = "Sac Fly"
+                runners[-1]["details"]["event"] = event_name
+                runners.append(self._runner(bases[2], "3B", "score", False, event_name, pidx, True))
+                bases[2] = None
+                runs += 1
+        elif result == "double_play":
+            event_name = "Grounded Into DP"
+            runners.append(self._runner(bases[0], "1B", None, True, event_name, pidx))
+            runners.append(self._runner(batter, None, None, True, event_name, pidx))
+            bases[0] = None
+            state["outs"] += 2
+            if state["outs"] < 3:
+                ents, n = self._advance(bases, 1, event_name, pidx)
+                runners += ents
+                runs += n
+        else:
+            event_name = "Groundout"
+            runners.append(self._runner(batter, None, None, True, event_name, pidx))
+            state["outs"] += 1
+            if state["outs"] < 3:
+                ents, n = self._advance(bases, 1, event_name, pidx, forced_only=r.random() > 0.5)
+                runners += ents
+                runs += n
+
+        if state["outs"] >= 3:
+            # no runs score on the third out
+            runners = [x for x in runners if not (x["movement"]["end"] == "score" and x["details"]["playIndex"] == pidx)]
+            runs = 0
+            state["outs"] = 3
+
+        state["score"][batting] += runs
+
+        # real feeds don't list runners in any reliable order
+        if r.random() < rc:
+            r.shuffle(runners)
+
+        play = {
+            "result" : {"type" : "atBat", "event" : event_name, "eventType" : event_name.lower().replace(" ","_"),
+                        "description" : "{0}: {1}".format(self._name(batter), event_name),
+                        "awayScore" : state["score"]["away"], "homeScore" : state["score"]["home"], "rbi" : runs},
+            "about" : {"atBatIndex" : state["abidx"], "halfInning" : half, "inning" : inning,
+                       "startTime" : "{0}T23:{1:02d}:00.000Z".format(state["date"], state["abidx"] % 60),
+                       "isComplete" : True, "isScoringPlay" : runs > 0},
+            "count" : {"balls" : min(balls,3), "strikes" : min(strikes,2), "outs" : state["outs"]},
+            "matchup" : {"batter" : {"id" : batter, "fullName" : self._name(batter)},
+                         "batSide" : {"code" : self._players["ID{0}".format(batter)]["batSide"]["code"]},
+                         "pitcher" : {"id" : pitcher, "fullName" : self._name(pitcher)},
+                         "pitchHand" : {"code" : self._players["ID{0}".format(pitcher)]["pitchHand"]["code"]}},
+            "playEvents" : events,
+            "runners" : runners,
+            "atBatIndex" : state["abidx"],
+            }
+        state["abidx"] += 1
+        return play, runs
+
+    def game(self, gamePk=1, date=dt.date(2019,4,16), away=None, home=None, innings=9):
+        # a full synthetic game feed, as a dict
+        r = self._rand
+        self._players = {}
+        self._names = set()
+        if away is None or home is None:
+            away, home = r.sample(_teams, 2)
+        date_s = date.strftime("%Y-%m-%d")
+        state = {
+            "date" : date_s,
+            "lineup" : {t : [self._new_player(r.choice(["C","1B","2B","3B","SS","LF","CF","RF","DH"])) for i in range(9)]
+                        for t in ["away", "home"]},
+            "order" : {"away" : 0, "home" : 0},
+            "pitcher" : {t : self._new_player("P") for t in ["away", "home"]},
+            "pitch_count" : {"away" : 0, "home" : 0},
+            "score" : {"away" : 0, "home" : 0},
+            "abidx" : 0,
+            }
+        umpire = 427000 + r.randint(0, 999)
+
+        plays = []
+        linescore = []
+        inning = 0
+        while True:
+            inning += 1
+            line = {"num" : inning, "ordinalNum" : str(inning), "away" : {}, "home" : {}}
+            for half in ["top", "bottom"]:
+                if half == "bottom" and inning >= innings and state["score"]["home"] > state["score"]["away"]:
+                    break
+                batting = "away" if half == "top" else "home"
+                state["bases"] = [None, None, None]
+                state["outs"] = 0
+                hruns = 0
+                while state["outs"] < 3:
+                    play, runs = self._plate_appearance(half, inning, state)
+                    plays.append(play)
+                    hruns += runs
+                    if half == "bottom" and inning >= innings and state["score"]["home"] > state["score"]["away"]:
+                        break
+                line[batting] = {"runs" : hruns, "hits" : 0, "errors" : 0, "leftOnBase" : 0}
+            linescore.append(line)
+            if inning >= innings and state["score"]["home"] != state["score"]["away"]:
+                break
+
+        gid = "{0}/{1}mlb-{2}mlb-1".format(date.strftime("%Y/%m/%d"), away[1], home[1])
+        return {
+            "copyright" : "Synthetic game generated by pitchdf.SyntheticGames",
+            "gamePk" : gamePk,
+            "link" : "/api/v1.1/game/{0}/feed/live".format(gamePk),
+            "metaData" : {"wait" : 10, "timeStamp" : date.strftime("%Y%m%d_230000"), "gameEvents" : [], "logicalEvents" : []},
+            "gameData" : {
+                "game" : {"pk" : gamePk, "type" : "R", "doubleHeader" : "N", "id" : gid, "gamedayType" : "P",
+                          "tiebreaker" : "N", "gameNumber" : 1, "season" : str(date.year)},
+                "datetime" : {"dateTime" : "{0}T23:05:00Z".format(date_s), "originalDate" : date_s,
+                              "dayNight" : "night", "time" : "7:05", "ampm" : "PM"},
+                "status" : {"abstractGameState" : "Final", "codedGameState" : "F", "detailedState" : "Final",
+                            "statusCode" : "F", "abstractGameCode" : "F"},
+                "teams" : {
+                    "away" : {"id" : away[0], "teamCode" : away[1], "abbreviation" : away[1].upper()},
+                    "home" : {"id" : home[0], "teamCode" : home[1], "abbreviation" : home[1].upper()},
+                    },
+                "players" : self._players,
+                },
+            "liveData" : {
+                "plays" : {"allPlays" : plays, "currentPlay" : plays[-1], "scoringPlays" : [], "playsByInning" : []},
+                "linescore" : {"currentInning" : inning, "innings" : linescore,
+                               "teams" : {"home" : {"runs" : state["score"]["home"]},
+                                          "away" : {"runs" : state["score"]["away"]}}},
+                "boxscore" : {"officials" : [
+                    {"official" : {"id" : umpire, "fullName" : "Ump Ire"}, "officialType" : "Home Plate"},
+                    {"official" : {"id" : umpire+1, "fullName" : "Other Ump"}, "officialType" : "First Base"},
+                    ]},
+                "decisions" : {},
+                },
+            }
+
+    def games(self, ngames, startdate=dt.date(2019,3,28), games_per_day=15, first_pk=900000):
+        # generate ngames games over consecutive days
+        for i in range(ngames):
+            yield self.game(first_pk + i, startdate + dt.timedelta(i // games_per_day))
+
+    def game_bytes(self, *args, **kwargs):
+        # same as game(), as encoded json bytes
+        return json.dumps(self.game(*args, **kwargs))
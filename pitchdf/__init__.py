@@ -3,3 +3,18 @@ import Output
 import OutputROOT
 import OutputDF
 import DownloadGames
+import DownloadManifest
+import ScheduleCache
+import FakeStatsAPI
+import RequestScheduler
+import GameArchive
+import GameIO
+import ParallelParse
+import PitchInfo
+import Corrections
+import ParseCheckpoint
+import ParseCache
+import ParseStats
+import SyntheticGames
+import PitchBlock
+import OutputParquet
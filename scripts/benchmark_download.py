@@ -0,0 +1,55 @@
+import os,sys,time,json,shutil,tempfile
+sys.path.append("..")
+import pitchdf.DownloadGames as dl
+from pitchdf.FakeStatsAPI import FakeStatsAPI
+
+# Measures download throughput of each DownloadGames mode against a local FakeStatsAPI,
+# so it can be repeated offline. Results are printed and written to bench_download.json
+
+ngames = 200
+game_size = 2*1024*1024   # bytes per synthetic game
+games_dir = None          # set to a directory of recorded games to serve those instead
+latency = 0.05            # seconds added to each response
+error_rate = 0.0
+rate_limit = None
+jobs = 8
+
+modes = [
+    ("serial",     dict(jobs=1)),
+    ("serial_raw", dict(jobs=1, raw=True)),
+    ("jobs",       dict(jobs=jobs)),
+    ("jobs_raw",   dict(jobs=jobs, raw=True)),
+    ]
+
+api = FakeStatsAPI(games_dir=games_dir, synthetic_games=0 if games_dir else ngames, synthetic_size=game_size,
+                   latency=latency, error_rate=error_rate, rate_limit=rate_limit)
+dl.BASE_URL = api.start()
+pks = api.gamePks
+print "Serving {0} games at {1}".format(len(pks), dl.BASE_URL)
+
+results = {}
+for name, kwargs in modes:
+    outdir = tempfile.mkdtemp(prefix="pitchdf_bench_")
+    api.reset_stats()
+    t0 = time.time()
+    dl.download_gamePks(pks, output_dir=outdir, **kwargs)
+    elapsed = time.time() - t0
+    shutil.rmtree(outdir)
+
+    results[name] = {
+        "games" : len(pks),
+        "seconds" : elapsed,
+        "games_per_sec" : len(pks) / elapsed,
+        "bytes_per_sec" : api.stats["bytes"] / elapsed,
+        "requests" : api.stats["requests"],
+        "errors" : api.stats["errors"] + api.stats["rate_limited"],
+        }
+    print "{0:12s} {1:8.2f} games/s {2:8.2f} MB/s  ({3:.1f} s)".format(
+        name, results[name]["games_per_sec"], results[name]["bytes_per_sec"]/1e6, elapsed)
+
+api.stop()
+
+json.dump({"config" : {"ngames":len(pks), "game_size":game_size, "latency":latency, "error_rate":error_rate,
+                       "rate_limit":rate_limit, "jobs":jobs},
+           "results" : results},
+          open("bench_download.json", 'w'), indent=4, sort_keys=True)
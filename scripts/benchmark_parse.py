@@ -0,0 +1,135 @@
+import os,sys,time,json,shutil,tempfile,subprocess,platform
+sys.path.append("..")
+from pitchdf.SyntheticGames import SyntheticGames
+from pitchdf.GameJSONParser import GameJSONParser
+from pitchdf.OutputDF import OutputDF, OutputCSV
+from pitchdf.OutputROOT import OutputROOT
+
+# Microbenchmarks of the parsing hot paths (process_pitch, process_atbat, parse_game,
+# OutputDF.add_entry, create_df and each writer) on synthetic games, so that changes can be
+# compared across commits without any real data. Results are printed and written to
+# bench_parse_<commit>.json
+
+ngames = 200
+pitches_per_game = 290
+runner_complexity = 0.3
+missing_rate = 0.02
+seed = 0
+repeats = 3               # timings are the best of this many runs
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).strip()
+    except Exception:
+        return "unknown"
+
+class quiet:
+    # the parser prints a line per game; keep it out of the timings
+    def __enter__(self):
+        self._stdout = sys.stdout
+        sys.stdout = open(os.devnull, 'w')
+    def __exit__(self, *args):
+        sys.stdout.close()
+        sys.stdout = self._stdout
+
+def timed(obj, name, totals):
+    # replace the method obj.name with one that adds up its time and number of calls in totals[name]
+    method = getattr(obj, name)
+    totals[name] = [0.0, 0]
+    def wrapper(*args):
+        t0 = time.time()
+        r = method(*args)
+        totals[name][0] += time.time() - t0
+        totals[name][1] += 1
+        return r
+    setattr(obj, name, wrapper)
+
+def parse_all(output):
+    parser = GameJSONParser(output)
+    with quiet():
+        t0 = time.time()
+        for gd in games:
+            parser.parse_game(gd)
+        return time.time() - t0
+
+def best(f):
+    return min(f() for i in range(repeats))
+
+gen = SyntheticGames(seed=seed, pitches_per_game=pitches_per_game,
+                     runner_complexity=runner_complexity, missing_rate=missing_rate)
+games = list(gen.games(ngames))
+npitches = sum(1 for gd in games for play in gd["liveData"]["plays"]["allPlays"]
+               for e in play["playEvents"] if e["type"] == "pitch")
+print "{0} games, {1} pitches".format(ngames, npitches)
+
+results = {}
+
+# whole games
+t = best(lambda: parse_all(OutputDF(None)))
+results["parse_game"] = {"seconds" : t, "us_per_game" : 1e6*t/ngames, "us_per_pitch" : 1e6*t/npitches}
+
+# the per-call hot paths, each timed on its own inside a full parse
+# (process_atbat includes process_pitch, which includes add_entry, and their timer overhead).
+# add_entry is timed with batching off, add_entries (one call per game) with it on
+def per_call(batch):
+    output = OutputDF(None)
+    parser = GameJSONParser(output, batch=batch)
+    totals = {}
+    timed(parser, "process_atbat", totals)
+    timed(parser, "process_pitch", totals)
+    timed(output, "add_entries" if batch else "add_entry", totals)
+    with quiet():
+        for gd in games:
+            parser.parse_game(gd)
+    return totals
+runs = [per_call(False) for i in range(repeats)]
+for name in ["process_atbat", "process_pitch", "add_entry"]:
+    t, n = min(r[name] for r in runs)
+    results[name] = {"seconds" : t, "calls" : n, "us_per_call" : 1e6*t/n}
+t, n = min(per_call(True)["add_entries"] for i in range(repeats))
+results["add_entries"] = {"seconds" : t, "calls" : n, "us_per_call" : 1e6*t/n, "us_per_pitch" : 1e6*t/npitches}
+
+# create_df on a full output
+def create_df():
+    output = OutputDF(None)
+    parse_all(output)
+    t0 = time.time()
+    output.create_df()
+    return time.time() - t0
+t = best(create_df)
+results["create_df"] = {"seconds" : t, "rows" : npitches, "us_per_row" : 1e6*t/npitches}
+
+# writers: time to write out a full output, and the size of the file
+outdir = tempfile.mkdtemp(prefix="pitchdf_bench_")
+writers = [
+    ("write_pickle",    lambda f: OutputDF(f),   lambda o: o.write(use_gzip=False), "pitches.pkl"),
+    ("write_pickle_gz", lambda f: OutputDF(f),   lambda o: o.write(use_gzip=True),  "pitches.pkl.gz"),
+    ("write_csv_gz",    lambda f: OutputCSV(f),  lambda o: o.write(use_gzip=True),  "pitches.csv.gz"),
+    ("write_root",      lambda f: OutputROOT(f), lambda o: o.write(),               "pitches.root"),
+    ]
+for name, make, write, fname in writers:
+    times = []
+    for i in range(repeats):
+        output = make(os.path.join(outdir, fname.replace(".gz","")))
+        parse_all(output)
+        t0 = time.time()
+        write(output)
+        times.append(time.time() - t0)
+        del output
+    size = os.path.getsize(os.path.join(outdir, fname))
+    results[name] = {"seconds" : min(times), "bytes" : size, "us_per_row" : 1e6*min(times)/npitches}
+shutil.rmtree(outdir)
+
+for name in sorted(results):
+    r = results[name]
+    unit = sorted(k for k in r if k.startswith("us_per"))[-1]
+    print "{0:16s} {1:10.3f} s {2:10.2f} {3}".format(name, r["seconds"], r[unit], unit)
+
+commit = git_commit()
+json.dump({"commit" : commit, "python" : platform.python_version(),
+           "config" : {"ngames":ngames, "pitches":npitches, "pitches_per_game":pitches_per_game,
+                       "runner_complexity":runner_complexity, "missing_rate":missing_rate,
+                       "seed":seed, "repeats":repeats},
+           "results" : results},
+          open("bench_parse_{0}.json".format(commit), 'w'), indent=4, sort_keys=True)
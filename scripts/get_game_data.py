@@ -3,32 +3,97 @@ sys.path.append("..")
 from pitchdf.GameJSONParser import GameJSONParser
 from pitchdf.OutputROOT import OutputROOT
 from pitchdf.OutputDF import OutputDF, OutputCSV
+from pitchdf.OutputParquet import OutputParquet
 from pitchdf.GameState import GameState
+from pitchdf.GameArchive import GameArchive
+from pitchdf.GameIO import find_game_file, load_game, read_game_bytes
+from pitchdf.ParallelParse import parse_parallel
+from pitchdf.ParseCheckpoint import ParseCheckpoint
+from pitchdf.ParseCache import ParseCache
+from pitchdf.ParseStats import ParseStats
 # from pitchdf.DownloadGames import *
 
 
 year = 2018
+# set to a packed season archive (see pitchdf/GameArchive.py) to read the games from it
+# instead of from the gid directories
+archive_file = None
+# number of worker processes to parse with (only for OutputDF)
+jobs = 1
+# skip (and log) games that fail to parse instead of stopping, and checkpoint the serial
+# parse so that it can be restarted where it left off (only for OutputDF)
+quarantine = False
+# reuse the rows of games whose feed (and the parser) haven't changed since the last run
+cache_dir = None
+# time the phases of the (serial) parse and profile it; per-game numbers go to this json-lines file
+stats_log = None
+# hold at most this many MB of rows in memory, flushing the rest to disk until the output is written
+# (for the pickled OutputDF this only bounds memory during the parse; write() still builds the whole dataframe)
+# (not with quarantine, whose checkpoints are taken from the rows in memory)
+chunk_mb = None
 
 gids = sorted([x.split("/")[-1] for x in glob.glob("/nfs-7/userdata/{0}/gamelogs/{1}/gid*".format(os.environ["USER"],year))])
 # gids = ["gid_2017_06_29_nyamlb_chamlb_1"]
 
 # output = OutputROOT("../output_fromJSON/pitches_{0}.root".format(year))
-output = OutputDF("../output_fromJSON/pitches_{0}.pkl".format(year))
-parser = GameJSONParser(output)
+output = OutputDF("../output_fromJSON/pitches_{0}.pkl".format(year), chunk_mb=chunk_mb)
+# output = OutputParquet("../output_fromJSON/pitches_{0}/".format(year))
+stats = ParseStats(log_file=stats_log, profile=True) if stats_log is not None else None
+parser = GameJSONParser(output, quarantine=quarantine,
+                        quarantine_log="../output_fromJSON/quarantine_{0}.jsonl".format(year) if quarantine else None,
+                        stats=stats)
+cache = ParseCache(cache_dir) if cache_dir is not None else None
+ckpt = ParseCheckpoint("../output_fromJSON/pitches_{0}.ckpt".format(year), output) if quarantine else None
 
 indir = "/nfs-7/userdata/{0}/gamelogs/{1}".format(os.environ["USER"],year)
+if archive_file is not None:
+    gids = []
+    if jobs > 1:
+        parse_parallel(GameArchive(archive_file).gamePks(), output, jobs=jobs, archive=archive_file, cache_dir=cache_dir)
+    else:
+        archive = GameArchive(archive_file)
+        for pk in archive.gamePks():
+            if ckpt is not None and pk in ckpt:
+                continue
+            if cache is not None:
+                cache.parse(parser, archive.read_raw(pk))
+            else:
+                parser.parse_game(archive.read(pk, paths=GameJSONParser.feed_paths))
+            if ckpt is not None:
+                ckpt.game_done(pk)
+elif jobs > 1:
+    fnames = [find_game_file(os.path.join(indir,gid)) for gid in gids]
+    parse_parallel([f for f in fnames if f is not None], output, jobs=jobs, cache_dir=cache_dir)
+    gids = []
+
 for gid in gids:
     # if "2019_1" not in gid:
     #     continue
-    fname = os.path.join(indir,gid,"livefeed.json.gz")
-    if not os.path.exists(fname):
+    if ckpt is not None and gid in ckpt:
+        continue
+    fname = find_game_file(os.path.join(indir,gid))
+    if fname is None:
         print "ERROR: gid {0} does not exist. Skipping.".format(gid)
         continue
 
-    gd = None
-    with gzip.open(fname, "rb") as fid:
-        gd = json.loads(fid.read().decode("utf-8"))
-
+    if cache is not None:
+        cache.parse(parser, read_game_bytes(fname))
+    else:
+        if stats is not None:
+            with stats.timer("decode"):
+                gd = load_game(fname, paths=GameJSONParser.feed_paths)
+        else:
+            gd = load_game(fname, paths=GameJSONParser.feed_paths)
         parser.parse_game(gd)
+    if ckpt is not None:
+        ckpt.game_done(gid)
 
-output.write()
+if ckpt is not None:
+    ckpt.save()
+if stats is not None:
+    with stats.timer("write"):
+        output.write()
+    print stats.summary()
+    stats.print_profile(30)
+else:
+    output.write()
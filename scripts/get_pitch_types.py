@@ -3,15 +3,15 @@ sys.path.append("..")
 import gzip
 import json
 import glob
+from pitchdf.GameIO import find_game_file, load_game
 
 year = 2015
 types = []
 for dname in glob.glob("/nfs-7/userdata/{0}/gamelogs/{1}/*".format(os.environ["USER"],year)):
-    fname = os.path.join(dname,"livefeed.json.gz")
-    if not os.path.exists(fname):
+    fname = find_game_file(dname)
+    if fname is None:
         continue
-    with gzip.open(fname, 'rb') as f:
-        d = json.loads(f.read())
+    d = load_game(fname, paths=["liveData.plays.allPlays"])
 
     for play in d["liveData"]["plays"]["allPlays"]:
         for event in play["playEvents"]:
@@ -3,6 +3,7 @@ sys.path.append("..")
 import gzip
 import json
 import glob
+from pitchdf.GameIO import find_game_file, load_game
 from tqdm import tqdm
 
 if os.path.exists("personIds.json"):
@@ -13,11 +14,10 @@ else:
 for year in range(2010,2020):
     print year
     for dname in tqdm(glob.glob("/nfs-7/userdata/{0}/gamelogs/{1}/*".format(os.environ["USER"],year))):
-        fname = os.path.join(dname,"livefeed.json.gz")
-        if not os.path.exists(fname):
+        fname = find_game_file(dname)
+        if fname is None:
             continue
-        with gzip.open(fname, 'rb') as f:
-            d = json.loads(f.read())
+        d = load_game(fname, paths=["liveData.boxscore.officials", "gameData.players"])
             
         for p in d["liveData"]["boxscore"]["officials"]:
             first, last = p["official"]["fullName"].rsplit(None, 1)